@@ -1,30 +1,219 @@
 import json
 import re
+from collections import Counter
+from functools import lru_cache
 
+from instrumentation.spans import record_cache, span
+from Store_and_embed.question_store import is_nested_file, iter_questions, to_nested, write_questions
+
+# Compiled once; extract_subtopic runs for every question in the bank
+BOLD_RE = re.compile(r"\*\*([^\*]+)\*\*")
+QUOTED_RE = re.compile(r'"([^"]+)"')
+PHRASE_RE = re.compile(r"subtopic (is|would be|for this question would be)[:\s]*([A-Za-z \-/()]+)")
+ACRONYM_RE = re.compile(r"^(.*?)\s*\(([A-Z][A-Z0-9]{1,9})s?\)$")  # "... (NLP)", "... (LLMs)"
+WORD_RE = re.compile(r"[A-Za-z0-9]+")
+KEY_RE = re.compile(r"[^a-z0-9]+")
+MINOR_WORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"}
+
+# Short forms the LLM uses interchangeably with the full label
+CANONICAL_ALIASES = {
+    "nlp": "Natural Language Processing",
+    "cv": "Computer Vision",
+    "gan": "Generative Adversarial Networks",
+    "gans": "Generative Adversarial Networks",
+    "llm": "Large Language Models",
+    "llms": "Large Language Models",
+    "rl": "Reinforcement Learning",
+    "ml": "Machine Learning",
+    "dl": "Deep Learning",
+    "genai": "Generative AI",
+}
+
+
+@lru_cache(maxsize=65536)
 def extract_subtopic(text):
     # Match patterns like "Generative Models", "Computer Vision", "NLP", etc.
-    match = re.search(r"\*\*([^\*]+)\*\*", text)
+    match = BOLD_RE.search(text)
     if match:
         return match.group(1).strip()
-    match = re.search(r'"([^"]+)"', text)
+    match = QUOTED_RE.search(text)
     if match:
         return match.group(1).strip()
-    match = re.search(r"subtopic (is|would be|for this question would be)[:\s]*([A-Za-z \-/()]+)", text)
+    match = PHRASE_RE.search(text)
     if match:
         return match.group(2).strip()
     return text if len(text.split()) <= 4 else "General"
 
-def clean_subtopics(input_file, output_file):
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    for marks_key, questions in data.items():
+def label_key(label):
+    return KEY_RE.sub(" ", label.lower()).strip()
+
+
+def split_acronym(label):
+    # "Natural Language Processing (NLP)" -> ("Natural Language Processing", "NLP"). Only an uppercase
+    # acronym spelling the full form's initials counts: "Regression (Linear)" or "Optimization (ADAM)"
+    # are qualified labels and stay as they are.
+    match = ACRONYM_RE.match(label)
+    if not match:
+        return None
+    full, acronym = match.group(1).strip(), match.group(2)
+    words = WORD_RE.findall(full)
+    initials = "".join(w[0] for w in words).upper()
+    major_initials = "".join(w[0] for w in words if w.lower() not in MINOR_WORDS).upper()
+    if not words or acronym not in (initials, major_initials):
+        return None
+    return full, acronym
+
+
+class SubtopicNormalizer:
+    """Maps raw LLM subtopic strings to a small canonical label set.
+
+    Each distinct raw string is extracted only once; ``fit_clusters`` can
+    optionally merge near-synonyms using an embeddings model.
+    """
+
+    def __init__(self, aliases=None):
+        self.aliases = {label_key(k): v for k, v in (aliases or CANONICAL_ALIASES).items()}
+        self.canonical = {}  # label key -> canonical label
+        self.cache = {}  # raw string -> canonical label
+        self.ambiguous = set()  # acronym keys seen with more than one full form; never aliased
+        self.hits = 0
+        self.misses = 0
+
+    def add_alias(self, acronym_key, full):
+        if acronym_key in self.aliases or acronym_key in self.ambiguous:
+            return
+        self.aliases[acronym_key] = full
+        # A bare acronym seen earlier was canonicalized to itself; move it and its cached raws over
+        stale = self.canonical.pop(acronym_key, None)
+        if stale is not None:
+            target = self.canonicalize(full)
+            self.cache = {raw: target if label == stale else label for raw, label in self.cache.items()}
+
+    def learn_alias(self, label):
+        # "Natural Language Processing (NLP)" teaches "NLP" -> "Natural Language Processing";
+        # returns the full form, or None if the label is not "Full Form (ACRONYM)"
+        parts = split_acronym(label)
+        if parts is None:
+            return None
+        full, acronym = parts
+        self.add_alias(label_key(acronym), full)
+        return full
+
+    def learn_aliases(self, raws):
+        # First pass over the whole input (an iterable of raw strings, or a Counter of them).
+        # Most frequent raw string first, ties alphabetically, so neither input nor hash order
+        # matters; an acronym used with two different full forms is left unaliased.
+        counts = raws if isinstance(raws, Counter) else Counter(raws)
+        forms = {}  # acronym key -> {full key: full form}
+        for raw in sorted(counts, key=lambda r: (-counts[r], r or "")):
+            parts = split_acronym(extract_subtopic(raw or ""))
+            if parts is not None:
+                full, acronym = parts
+                forms.setdefault(label_key(acronym), {}).setdefault(label_key(full), full)
+
+        for acronym_key, fulls in forms.items():
+            if len(fulls) > 1:
+                self.ambiguous.add(acronym_key)
+            else:
+                self.add_alias(acronym_key, next(iter(fulls.values())))
+
+    def canonicalize(self, label):
+        label = self.learn_alias(label) or label
+        key = label_key(label)
+        label = self.aliases.get(key, label)
+        key = label_key(label)
+        return self.canonical.setdefault(key, label)
+
+    def normalize(self, raw):
+        label = self.cache.get(raw)
+        if label is None:
+            self.misses += 1
+            label = self.canonicalize(extract_subtopic(raw or ""))
+            self.cache[raw] = label
+        else:
+            self.hits += 1
+        return label
+
+    def report_cache(self):
+        # One span per batch/run instead of one per lookup; counters restart afterwards
+        if self.hits or self.misses:
+            record_cache("subtopics.normalize", self.hits, self.misses)
+            self.hits = self.misses = 0
+
+    def normalize_batch(self, raws):
+        # Normalize each unique string once, then map the whole batch
+        self.learn_aliases(raws)
+        unique = {raw: self.normalize(raw) for raw in set(raws)}
+        self.report_cache()
+        return [unique[raw] for raw in raws]
+
+    def fit_clusters(self, label_counts, embeddings, threshold=0.9):
+        # Greedy cosine clustering: the most frequent label in a cluster becomes its canonical name
+        import numpy as np
+
+        labels = [label for label, _ in Counter(label_counts).most_common()]
+        if len(labels) < 2:
+            return {}
+
+        with span("subtopics.embed_labels") as s:
+            vectors = np.asarray(embeddings.embed_documents(labels), dtype="float32")
+            s.add_items(len(labels))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        similarity = vectors @ vectors.T
+
+        merged = {}
+        assigned = np.full(len(labels), -1)
+        for i in range(len(labels)):
+            if assigned[i] != -1:
+                continue
+            members = np.where((similarity[i] >= threshold) & (assigned == -1))[0]
+            assigned[members] = i
+            for j in members:
+                if j != i:
+                    merged[labels[j]] = labels[i]
+
+        for variant, canonical in merged.items():
+            self.canonical[label_key(variant)] = canonical
+        self.cache = {raw: merged.get(label, label) for raw, label in self.cache.items()}
+        return merged
+
+
+def iter_cleaned(questions, normalizer=None):
+    normalizer = normalizer or SubtopicNormalizer()
+    try:
         for q in questions:
-            original = q.get("subtopic", "")
-            q["subtopic"] = extract_subtopic(original)
+            q["subtopic"] = normalizer.normalize(q.get("subtopic", ""))
+            yield q
+    finally:
+        normalizer.report_cache()
+
+
+def clean_subtopics(input_file, output_file, embeddings=None, threshold=0.9):
+    # JSONL → JSONL runs line by line in constant memory; a .json output keeps the nested export format
+    normalizer = SubtopicNormalizer()
+
+    # First pass only counts distinct raw strings (memory is bounded by those, not the bank) and
+    # learns every "Full Name (ACR)" alias before any question gets its label
+    raw_counts = Counter(q.get("subtopic", "") for q in iter_questions(input_file))
+    normalizer.learn_aliases(raw_counts)
+
+    if embeddings is not None:
+        counts = Counter()
+        for raw, n in raw_counts.items():
+            counts[normalizer.normalize(raw)] += n
+        normalizer.report_cache()
+        merged = normalizer.fit_clusters(counts, embeddings, threshold=threshold)
+        for variant, canonical in merged.items():
+            print(f"🔗 {variant} → {canonical}")
+
+    cleaned = iter_cleaned(iter_questions(input_file), normalizer)
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if is_nested_file(output_file):
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(to_nested(cleaned), f, indent=2, ensure_ascii=False)
+    else:
+        write_questions(cleaned, output_file)
 
     print(f"✅ Cleaned subtopics saved to: {output_file}")
 
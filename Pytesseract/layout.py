@@ -0,0 +1,203 @@
+import glob
+import os
+
+from instrumentation.spans import span
+
+try:
+    from Pytesseract.refinement import detect_math_symbols, load_pytesseract, refine_text
+except ImportError:
+    from refinement import detect_math_symbols, load_pytesseract, refine_text  # running from inside Pytesseract/
+
+# One layout pass per page/image over a single decoded RGB buffer: OCR text + text blocks
+# (one tesseract call), contour count/density and diagram boxes (one threshold + findContours),
+# embedded-image count/boxes from the PDF page, and the math-symbol flag.
+
+CONTOUR_DIAGRAM_THRESHOLD = 20  # Heuristic: many contours = likely diagram
+MIN_DIAGRAM_AREA = 0.01  # contour boxes smaller than this fraction of the page are text/noise
+MIN_DIAGRAM_SIDE = 0.05  # ... or narrower/shorter than this fraction of the page side
+MAX_TEXT_OVERLAP = 0.5  # contour boxes mostly inside an OCR text block are glyphs, not diagrams
+CROP_PADDING = 8
+
+
+def decode_image(file_path):
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(file_path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def pixmap_to_array(pix):
+    # Use the rendered samples directly instead of a PNG encode/decode round trip
+    import numpy as np
+
+    rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return rgb[..., :3] if pix.n > 3 else rgb
+
+
+def merge_boxes(boxes):
+    # Union overlapping (x, y, w, h) boxes until none overlap
+    boxes = [list(b) for b in boxes]
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                ax, ay, aw, ah = boxes[i]
+                bx, by, bw, bh = boxes[j]
+                if ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah:
+                    x, y = min(ax, bx), min(ay, by)
+                    boxes[i] = [x, y, max(ax + aw, bx + bw) - x, max(ay + ah, by + bh) - y]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(int(v) for v in b) for b in boxes]
+
+
+def text_overlap(rects, blocks):
+    # Fraction of each rect's area covered by its most-overlapping text block, computed for all pairs at once
+    import numpy as np
+
+    if len(rects) == 0 or not blocks:
+        return np.zeros(len(rects))
+    blocks = np.asarray(blocks, dtype=np.int64)
+    rx0, ry0 = rects[:, None, 0], rects[:, None, 1]
+    rx1, ry1 = rx0 + rects[:, None, 2], ry0 + rects[:, None, 3]
+    bx0, by0 = blocks[None, :, 0], blocks[None, :, 1]
+    bx1, by1 = bx0 + blocks[None, :, 2], by0 + blocks[None, :, 3]
+    iw = np.clip(np.minimum(rx1, bx1) - np.maximum(rx0, bx0), 0, None)
+    ih = np.clip(np.minimum(ry1, by1) - np.maximum(ry0, by0), 0, None)
+    area = np.maximum(rects[:, 2] * rects[:, 3], 1)
+    return (iw * ih).max(axis=1) / area
+
+
+def ocr_with_blocks(gray):
+    # image_to_data gives the words and their boxes in the same tesseract pass
+    import numpy as np
+
+    pytesseract = load_pytesseract()
+    with span("ocr.tesseract") as s:
+        data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+        s.add_bytes(int(gray.nbytes))
+
+    words = np.array(data["text"], dtype=object)
+    keep = np.array([bool(w and w.strip()) for w in words])
+    if not keep.any():
+        return "", []
+
+    line_keys = np.stack([data["block_num"], data["par_num"], data["line_num"]], axis=1)[keep]
+    words = words[keep]
+    lines, current, last = [], [], None
+    for key, word in zip(map(tuple, line_keys), words):
+        if key != last and current:
+            lines.append(" ".join(current))
+            current = []
+        current.append(word)
+        last = key
+    lines.append(" ".join(current))
+
+    left = np.asarray(data["left"])[keep]
+    top = np.asarray(data["top"])[keep]
+    right = left + np.asarray(data["width"])[keep]
+    bottom = top + np.asarray(data["height"])[keep]
+    block_ids = np.asarray(data["block_num"])[keep]
+    blocks = []
+    for b in np.unique(block_ids):
+        m = block_ids == b
+        x, y = int(left[m].min()), int(top[m].min())
+        blocks.append((x, y, int(right[m].max()) - x, int(bottom[m].max()) - y))
+    return "\n".join(lines), blocks
+
+
+def analyze_layout(rgb, page=None, dpi=300):
+    import cv2
+    import numpy as np
+
+    height, width = rgb.shape[:2]
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+
+    text, text_blocks = ocr_with_blocks(gray)
+    with span("refine.text") as s:
+        refined = refine_text(text)
+        s.add_bytes(len(text))
+
+    with span("ocr.contours"):
+        _, thresh = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rects = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int64).reshape(-1, 4)
+        large = (
+            (rects[:, 2] * rects[:, 3] >= MIN_DIAGRAM_AREA * width * height)
+            & (rects[:, 2] >= MIN_DIAGRAM_SIDE * width)
+            & (rects[:, 3] >= MIN_DIAGRAM_SIDE * height)
+        )
+        large &= text_overlap(rects, text_blocks) <= MAX_TEXT_OVERLAP
+        diagram_boxes = [tuple(r) for r in rects[large]]
+
+    image_count = 0
+    if page is not None:
+        # Embedded images: bboxes are in PDF points, the render is at `dpi`
+        scale = dpi / 72
+        infos = page.get_image_info()
+        image_count = len(infos)
+        for info in infos:
+            x0, y0, x1, y1 = (v * scale for v in info["bbox"])
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(width, x1), min(height, y1)
+            if x1 > x0 and y1 > y0:
+                diagram_boxes.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+
+    return {
+        "width": width,
+        "height": height,
+        "text": text,
+        "refined": refined,
+        "has_math": detect_math_symbols(refined),
+        "image_count": image_count,
+        "contour_count": len(contours),
+        "contour_density": len(contours) / (width * height / 1e6),  # contours per megapixel
+        "text_blocks": text_blocks,
+        "diagram_boxes": merge_boxes(diagram_boxes),
+    }
+
+
+def clear_crops(out_dir, prefix):
+    # Drop crops left by an earlier run on the same input, so the folder only holds the current ones
+    for path in glob.glob(os.path.join(glob.escape(out_dir), f"{prefix}_diagram*.png")):
+        os.remove(path)
+
+
+def crop_diagrams(rgb, boxes, out_dir, prefix):
+    from PIL import Image
+
+    if not boxes:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    height, width = rgb.shape[:2]
+    crops = []
+    for n, (x, y, w, h) in enumerate(boxes, 1):
+        x0, y0 = max(0, x - CROP_PADDING), max(0, y - CROP_PADDING)
+        x1, y1 = min(width, x + w + CROP_PADDING), min(height, y + h + CROP_PADDING)
+        path = os.path.join(out_dir, f"{prefix}_diagram{n}.png")
+        Image.fromarray(rgb[y0:y1, x0:x1]).save(path)
+        crops.append((path, (x, y, w, h)))
+    return crops
+
+
+def layout_header(layout, crops=(), is_pdf_page=True):
+    # Same marker lines the pipeline has always emitted, plus one [DIAGRAM CROP] line per cropped diagram
+    lines = []
+    if is_pdf_page:
+        if layout["image_count"] > 0:
+            lines.append(f"[DIAGRAM or IMAGE DETECTED] ({layout['image_count']} images on this page)")
+        else:
+            lines.append("[No diagrams/images found]")
+    elif layout["contour_count"] > CONTOUR_DIAGRAM_THRESHOLD:
+        lines.append(f"[DIAGRAM or SHAPE CONTENT DETECTED] ({layout['contour_count']} contours)")
+    else:
+        lines.append("[No major shapes/diagrams detected]")
+    lines.append("[MATH SYMBOLS DETECTED]" if layout["has_math"] else "[No special patterns found]")
+    for path, (x, y, w, h) in crops:
+        lines.append(f"[DIAGRAM CROP] {path} (x={x}, y={y}, w={w}, h={h})")
+    return "\n".join(lines)
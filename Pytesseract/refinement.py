@@ -1,10 +1,26 @@
-import fitz  # PyMuPDF
-from PIL import Image
-from main import pytesseract 
-import io
-import cv2
-import numpy as np
+import os
 import re
+import sys
+from functools import lru_cache
+
+try:
+    from instrumentation.spans import span
+except ImportError:
+    # Running from inside Pytesseract/ (e.g. `python "without flask.py"`): make the repository root importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from instrumentation.spans import span
+
+# fitz, OpenCV, PIL and pytesseract are imported on first use, so importing this
+# module (e.g. for refine_text alone, or from the Streamlit app) stays cheap.
+
+
+@lru_cache(maxsize=None)
+def load_pytesseract():
+    try:
+        from Pytesseract.main import pytesseract
+    except ImportError:
+        from main import pytesseract  # running from inside Pytesseract/
+    return pytesseract
 
 
 # --- REFINEMENT TOOLS ---
@@ -29,47 +45,42 @@ def analyze_text(text):
 
 
 
-def detect_contours(image_path):
-    image = cv2.imread(image_path)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-    # Threshold to binary
-    _, thresh = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
-
-    # Find contours
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    contour_count = len(contours)
-    if contour_count > 20:  # Heuristic: many contours = likely diagram
-        return f"[DIAGRAM or SHAPE CONTENT DETECTED] ({contour_count} contours)"
-    else:
-        return "[No major shapes/diagrams detected]"
-
-
-def detect_images_in_page(page):
-    images = page.get_images(full=True)
-    image_count = len(images)
-    if image_count > 0:
-        return f"[DIAGRAM or IMAGE DETECTED] ({image_count} images on this page)"
-    return "[No diagrams/images found]"
-
-
-def handle_pdf(file_path):
+def load_layout():
     try:
-        doc = fitz.open(file_path)
-        full_text = ""
+        from Pytesseract import layout
+    except ImportError:
+        import layout  # running from inside Pytesseract/
+    return layout
 
-        for i, page in enumerate(doc):
-            print(f"🔍 Processing Page {i+1}")
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            text = pytesseract.image_to_string(img)
 
-            refined = refine_text(text)
-            analysis = analyze_text(refined)
-            image_check = detect_images_in_page(page)
-
-            full_text += f"\n\n--- Page {i+1} ---\n{image_check}\n{analysis}\n{refined}"
+def handle_pdf(file_path, crops_dir=None):
+    # Diagram crops go to <file>_diagrams/ unless crops_dir is given
+    try:
+        import fitz  # PyMuPDF
+
+        layout = load_layout()
+        crops_dir = crops_dir or os.path.splitext(file_path)[0] + "_diagrams"
+        layout.clear_crops(crops_dir, "page*")
+        with span("ocr.pdf", file=os.path.basename(file_path)) as pdf_span:
+            doc = fitz.open(file_path)
+            full_text = ""
+
+            for i, page in enumerate(doc):
+                print(f"🔍 Processing Page {i+1}")
+                with span("ocr.render", page=i + 1) as s:
+                    pix = page.get_pixmap(dpi=300)
+                    rgb = layout.pixmap_to_array(pix)
+                    s.add_bytes(rgb.nbytes)
+
+                with span("ocr.layout", page=i + 1) as s:
+                    page_layout = layout.analyze_layout(rgb, page=page, dpi=300)
+                    crops = layout.crop_diagrams(rgb, page_layout["diagram_boxes"], crops_dir, f"page{i+1}")
+                    header = layout.layout_header(page_layout, crops)
+                    s.add_bytes(len(page_layout["refined"]))
+                    s.add_items(len(crops))
+
+                full_text += f"\n\n--- Page {i+1} ---\n{header}\n{page_layout['refined']}"
+                pdf_span.add_items()
 
         return full_text.strip()
 
@@ -78,16 +89,23 @@ def handle_pdf(file_path):
 
 
 
-def handle_image(file_path):
+def handle_image(file_path, crops_dir=None):
     try:
+        layout = load_layout()
+        crops_dir = crops_dir or os.path.splitext(file_path)[0] + "_diagrams"
         print("📸 OCR running on:", file_path)
-        image = Image.open(file_path)
-        text = pytesseract.image_to_string(image)
-        refined = refine_text(text)
-        analysis = analyze_text(refined)
-        shape_check = detect_contours(file_path)
-
-        return f"{shape_check}\n{analysis}\n\n{refined}"
+        with span("ocr.image", file=os.path.basename(file_path)) as s:
+            # Decoded once; OCR, contours and crops all work on this buffer
+            rgb = layout.decode_image(file_path)
+            s.add_bytes(os.path.getsize(file_path))
+            with span("ocr.layout"):
+                image_layout = layout.analyze_layout(rgb)
+                stem = os.path.splitext(os.path.basename(file_path))[0].replace(" ", "_")
+                layout.clear_crops(crops_dir, stem)
+                crops = layout.crop_diagrams(rgb, image_layout["diagram_boxes"], crops_dir, stem)
+                header = layout.layout_header(image_layout, crops, is_pdf_page=False)
+
+        return f"{header}\n\n{image_layout['refined']}"
 
     except Exception as e:
-        return f"❌ Error processing image: {str(e)}"
\ No newline at end of file
+        return f"❌ Error processing image: {str(e)}"
@@ -0,0 +1,24 @@
+def difficulty_of(metadata):
+    # Indexes built by ollama_store.py store "difficulty"; older ones used "difficulty_level"
+    return (metadata.get("difficulty") or metadata.get("difficulty_level") or "").lower()
+
+
+def smart_filter(docs, marks, difficulty, cognitive):
+    # Shared by the CLI, the Streamlit app and the search service: exact -> same difficulty -> top 3
+    exact = [
+        d for d in docs
+        if d.metadata.get("marks") == marks
+        and difficulty_of(d.metadata) == difficulty.lower()
+        and d.metadata.get("cognitive_level", "").lower() == cognitive.lower()
+    ]
+    if exact:
+        return exact
+
+    fallback = [
+        d for d in docs
+        if difficulty_of(d.metadata) == difficulty.lower()
+    ]
+    if fallback:
+        return fallback
+
+    return docs[:3]
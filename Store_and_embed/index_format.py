@@ -0,0 +1,251 @@
+import glob
+import json
+import mmap
+import os
+import uuid
+
+from instrumentation.spans import span
+
+# Memory-mapped, pickle-free index layout (written next to LangChain's index.faiss / index.pkl):
+#
+#   meta.json              {"format": "coe-mmap-v1", "count": N, "dim": D, "metric": "l2",
+#                           "embedding_model": ..., "files": {"vectors": ..., "docs": ..., "offsets": ...}}
+#   vectors.<token>.npy    float32 [N, D], opened with np.load(mmap_mode="r")
+#   docs.<token>.jsonl     one {"page_content": ..., "metadata": {...}} per line, row i = vector i
+#   docs.<token>.idx.npy   uint64 [N + 1] byte offsets into docs.jsonl
+#
+# Loading only maps the files, so cold start does not depend on bank size, and every process
+# on the node shares the same page cache instead of holding its own copy of the vectors.
+#
+# Saving never rewrites a file that a reader may have mapped: each save writes data files under a
+# fresh token, then atomically replaces meta.json to point at them, then unlinks the old data files
+# (readers that still map them keep their pages until they close). Indexes written before "files"
+# existed use the fixed names below.
+
+FORMAT = "coe-mmap-v1"
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.jsonl"
+OFFSETS_FILE = "docs.idx.npy"
+
+
+class StoredDocument:
+    """Question read back from docs.jsonl (same page_content/metadata shape as a LangChain Document)."""
+
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"StoredDocument({self.page_content[:40]!r})"
+
+
+DATA_FILE_PATTERNS = (VECTORS_FILE, DOCS_FILE, OFFSETS_FILE, "vectors.*.npy", "docs.*.jsonl", "docs.*.idx.npy")
+
+
+def is_mmap_index(path):
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def index_files(meta):
+    files = meta.get("files") or {}
+    return (
+        files.get("vectors", VECTORS_FILE),
+        files.get("docs", DOCS_FILE),
+        files.get("offsets", OFFSETS_FILE),
+    )
+
+
+def remove_stale_files(path, keep):
+    for pattern in DATA_FILE_PATTERNS:
+        for file in glob.glob(os.path.join(path, pattern)):
+            if os.path.basename(file) in keep:
+                continue
+            try:
+                os.remove(file)
+            except OSError:
+                pass  # e.g. still mapped on Windows; the next save retries
+
+
+def save_mmap_index(path, vectors, documents, embedding_model=None):
+    import numpy as np
+
+    os.makedirs(path, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if len(vectors) != len(documents):
+        raise ValueError(f"{len(vectors)} vectors but {len(documents)} documents")
+
+    token = uuid.uuid4().hex[:12]
+    files = {"vectors": f"vectors.{token}.npy", "docs": f"docs.{token}.jsonl", "offsets": f"docs.{token}.idx.npy"}
+
+    with span("index.save_mmap", index=path) as s:
+        # New names only: nothing can have these mapped yet
+        np.save(os.path.join(path, files["vectors"]), vectors)
+
+        offsets = np.zeros(len(documents) + 1, dtype="uint64")
+        with open(os.path.join(path, files["docs"]), "wb") as f:
+            for i, doc in enumerate(documents):
+                line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+                f.write(line.encode("utf-8") + b"\n")
+                offsets[i + 1] = f.tell()
+        np.save(os.path.join(path, files["offsets"]), offsets)
+
+        # meta.json last and atomically: readers see either the old index or the complete new one
+        meta = {
+            "format": FORMAT,
+            "count": int(vectors.shape[0]),
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "metric": "l2",
+            "embedding_model": embedding_model,
+            "files": files,
+        }
+        tmp_meta = os.path.join(path, f"{META_FILE}.{token}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_meta, os.path.join(path, META_FILE))
+        remove_stale_files(path, keep=set(files.values()))
+        s.add_items(len(documents))
+        s.add_bytes(vectors.nbytes + int(offsets[-1]))
+    return meta
+
+
+def save_from_langchain(db, path, embedding_model=None):
+    # Vectors come straight out of the FAISS index; documents in index order
+    import numpy as np
+
+    n = db.index.ntotal
+    vectors = db.index.reconstruct_n(0, n) if n else np.zeros((0, db.index.d), dtype="float32")
+    documents = [db.docstore.search(db.index_to_docstore_id[i]) for i in range(n)]
+    return save_mmap_index(path, vectors, documents, embedding_model)
+
+
+class MmapIndex:
+    def __init__(self, path, embeddings=None):
+        self.path = path
+        self.embeddings = embeddings
+        try:
+            self.open()
+        except FileNotFoundError:
+            # A concurrent save replaced meta.json and removed the files it pointed to; read the new one
+            self.open()
+
+    def open(self):
+        import numpy as np
+
+        with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT:
+            raise ValueError(f"{self.path}: unsupported index format {self.meta.get('format')!r}")
+
+        vectors_file, docs_file, offsets_file = index_files(self.meta)
+        self.vectors = np.load(os.path.join(self.path, vectors_file), mmap_mode="r")
+        self.offsets = np.load(os.path.join(self.path, offsets_file), mmap_mode="r")
+        if len(self.vectors) != self.ntotal or len(self.offsets) != self.ntotal + 1:
+            raise ValueError(f"{self.path}: data files do not match meta.json")
+        self.docs_file = open(os.path.join(self.path, docs_file), "rb")
+        self.docs = mmap.mmap(self.docs_file.fileno(), 0, access=mmap.ACCESS_READ) if self.ntotal else b""
+
+    @property
+    def ntotal(self):
+        return self.meta["count"]
+
+    def close(self):
+        if isinstance(self.docs, mmap.mmap):
+            self.docs.close()
+        self.docs_file.close()
+
+    def get_document(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self.docs[start:end])
+        return StoredDocument(record["page_content"], record["metadata"])
+
+    def search_vectors(self, queries, k):
+        # Exact L2 search straight off the mapped vectors; returns (distances, ids) like faiss
+        import numpy as np
+
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype="float32")
+        k = min(k, self.ntotal)
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype="float32"), np.zeros((len(queries), 0), dtype="int64")
+        try:
+            import faiss
+        except ImportError:
+            return self.numpy_search(queries, k)
+        return faiss.knn(queries, self.vectors, k)
+
+    def numpy_search(self, queries, k, block=65536):
+        import numpy as np
+
+        q_norms = (queries ** 2).sum(axis=1)[:, None]
+        best_d = np.full((len(queries), 0), np.inf, dtype="float32")
+        best_i = np.zeros((len(queries), 0), dtype="int64")
+        for start in range(0, self.ntotal, block):
+            chunk = np.asarray(self.vectors[start:start + block])
+            d = q_norms - 2 * queries @ chunk.T + (chunk ** 2).sum(axis=1)[None, :]
+            ids = np.broadcast_to(np.arange(start, start + len(chunk)), d.shape)
+            d = np.concatenate([best_d, d], axis=1)
+            ids = np.concatenate([best_i, ids], axis=1)
+            top = np.argpartition(d, min(k, d.shape[1] - 1), axis=1)[:, :k]
+            best_d = np.take_along_axis(d, top, axis=1)
+            best_i = np.take_along_axis(ids, top, axis=1)
+        order = np.argsort(best_d, axis=1)
+        return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+    def similarity_search(self, query, k=4):
+        with span("index.mmap_search", k=k) as s:
+            vector = self.embeddings.embed_query(query)
+            _, ids = self.search_vectors([vector], k)
+            docs = [self.get_document(int(i)) for i in ids[0] if i != -1]
+            s.add_items(len(docs))
+        return docs
+
+
+class LangchainIndexAdapter:
+    """Gives a loaded LangChain FAISS store the same search_vectors/get_document interface as MmapIndex."""
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def ntotal(self):
+        return self.db.index.ntotal
+
+    def search_vectors(self, queries, k):
+        import numpy as np
+
+        return self.db.index.search(np.ascontiguousarray(queries, dtype="float32"), k)
+
+    def get_document(self, i):
+        return self.db.docstore.search(self.db.index_to_docstore_id[i])
+
+    def similarity_search(self, query, k=4):
+        return self.db.similarity_search(query, k=k)
+
+
+def as_vector_index(db):
+    return db if isinstance(db, MmapIndex) else LangchainIndexAdapter(db)
+
+
+def load_mmap_index(path, embeddings=None):
+    with span("index.load_mmap", index=path):
+        return MmapIndex(path, embeddings)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m Store_and_embed.index_format <langchain_index_dir> <output_dir>")
+        sys.exit(1)
+
+    from langchain_community.vectorstores import FAISS
+
+    from Store_and_embed.ollama_store import EMBEDDING_MODEL, get_embeddings
+
+    src, dst = sys.argv[1:]
+    # One-off migration: the legacy pickle is read once here and never again at serving time
+    db = FAISS.load_local(src, get_embeddings(), allow_dangerous_deserialization=True)
+    meta = save_from_langchain(db, dst, EMBEDDING_MODEL)
+    print(f"✅ Wrote {meta['count']} vectors ({meta['dim']}-d) to {dst}")
@@ -1,50 +1,56 @@
-from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
-
-# Load embeddings & FAISS vector store
-embeddings = OllamaEmbeddings(model="nomic-embed-text:latest") #changed embedding model from llama3
-db = FAISS.load_local("new_faiss_index", embeddings, allow_dangerous_deserialization=True)
+from instrumentation.spans import span
+from Store_and_embed.filters import smart_filter
+from Store_and_embed.index_format import is_mmap_index, load_mmap_index
+from Store_and_embed.ollama_store import get_embeddings
 
 # Search configuration
+INDEX_PATH = "new_faiss_index"
 query = "Natural language processing techniques for text classification"
 target_marks = 3
 target_difficulty = "medium"
 target_cognitive = "applying"
 
-def smart_filter(docs, marks, difficulty, cognitive):
-    exact = [
-        d for d in docs
-        if d.metadata.get("marks") == marks
-        and d.metadata.get("difficulty_level", "").lower() == difficulty.lower()
-        and d.metadata.get("cognitive_level", "").lower() == cognitive.lower()
-    ]
-    if exact:
-        return exact
-
-    fallback = [
-        d for d in docs
-        if d.metadata.get("difficulty_level", "").lower() == difficulty.lower()
-    ]
-    if fallback:
-        return fallback
-
-    return docs[:3]
-
-similar_questions = db.similarity_search(query, k=20)
-filtered = smart_filter(similar_questions, target_marks, target_difficulty, target_cognitive)
-
-# Step 3: Display results
-print(f"\n🎯 Filtered {len(filtered)} question(s) for:")
-print(f"   ➤ Marks: {target_marks}")
-print(f"   ➤ Difficulty: {target_difficulty}")
-print(f"   ➤ Cognitive Level: {target_cognitive}\n")
-
-for doc in filtered:
-    metadata = doc.metadata
-    print(f"❓ Question: {doc.page_content}")
-    print(f"🏷️  Topic: {metadata.get('topic', 'unknown')}")
-    print(f"🔹 Subtopic: {metadata.get('subtopic', 'unknown')}")
-    print(f"🎯 Marks: {metadata.get('marks', '?')}")
-    print(f"📈 Difficulty: {metadata.get('difficulty', 'unknown')}")
-    print(f"🧠 Cognitive Level: {metadata.get('cognitive_level', 'unknown')}")
-    print("-" * 60)
+
+def load_index(index_path=INDEX_PATH):
+    # Prefer the memory-mapped layout; fall back to LangChain's pickled index.pkl for older indexes
+    if is_mmap_index(index_path):
+        return load_mmap_index(index_path, get_embeddings())
+
+    from langchain_community.vectorstores import FAISS
+
+    # Load embeddings & FAISS vector store
+    with span("search.load_index", index=index_path):
+        return FAISS.load_local(index_path, get_embeddings(), allow_dangerous_deserialization=True)
+
+
+def search(db, query, marks, difficulty, cognitive, k=20):
+    with span("search.similarity", k=k) as s:
+        similar_questions = db.similarity_search(query, k=k)
+        s.add_items(len(similar_questions))
+    with span("search.filter"):
+        return smart_filter(similar_questions, marks, difficulty, cognitive)
+
+
+def main():
+    db = load_index()
+    filtered = search(db, query, target_marks, target_difficulty, target_cognitive)
+
+    # Step 3: Display results
+    print(f"\n🎯 Filtered {len(filtered)} question(s) for:")
+    print(f"   ➤ Marks: {target_marks}")
+    print(f"   ➤ Difficulty: {target_difficulty}")
+    print(f"   ➤ Cognitive Level: {target_cognitive}\n")
+
+    for doc in filtered:
+        metadata = doc.metadata
+        print(f"❓ Question: {doc.page_content}")
+        print(f"🏷️  Topic: {metadata.get('topic', 'unknown')}")
+        print(f"🔹 Subtopic: {metadata.get('subtopic', 'unknown')}")
+        print(f"🎯 Marks: {metadata.get('marks', '?')}")
+        print(f"📈 Difficulty: {metadata.get('difficulty', 'unknown')}")
+        print(f"🧠 Cognitive Level: {metadata.get('cognitive_level', 'unknown')}")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    main()
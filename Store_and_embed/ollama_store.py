@@ -1,46 +1,90 @@
-import json
 import os
-from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
-from langchain.schema import Document
+from functools import lru_cache
+from itertools import islice
+
+from instrumentation.spans import span
+from Store_and_embed.index_format import save_from_langchain
+from Store_and_embed.question_store import iter_questions
+
+EMBEDDING_MODEL = "nomic-embed-text:latest"
+EMBED_BATCH_SIZE = 256
+
+
+# Ollama embeddings client, created on first use
+@lru_cache(maxsize=None)
+def get_embeddings():
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=EMBEDDING_MODEL)
+
+
+def question_to_document(q):
+    from langchain.schema import Document
+
+    return Document(
+        page_content=q["question"],
+        metadata={
+            "id": q.get("id"),
+            "topic": q.get("topic", "unknown"),
+            "subtopic": q.get("subtopic", "unknown"),
+            "marks": q.get("marks", 0),
+            "type": q.get("question_type", "unknown"),
+            "difficulty": q.get("difficulty_level", "unknown"),
+            "cognitive_level": q.get("cognitive_level", "unknown"),
+            "time": q.get("time", "unknown")
+        }
+    )
+
+
+def iter_documents(file_path="questions.jsonl"):
+    # Works on both questions.jsonl (streamed) and the nested questions.json export
+    for q in iter_questions(file_path):
+        yield question_to_document(q)
 
-# Load Ollama embeddings
-embeddings = OllamaEmbeddings(model="nomic-embed-text:latest")
 
 def load_questions(file_path="questions.json"):
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    docs = []
-
-    for mark_group, questions in data.items():
-        for q in questions:
-            doc = Document(
-                page_content=q["question"],
-                metadata={
-                    "topic": q.get("topic", "unknown"),
-                    "subtopic": q.get("subtopic", "unknown"),
-                    "marks": q.get("marks", 0),
-                    "type": q.get("question_type", "unknown"),
-                    "difficulty": q.get("difficulty_level", "unknown"),
-                    "cognitive_level": q.get("cognitive_level", "unknown"),
-                    "time": q.get("time", "unknown")
-                }
-            )
-            docs.append(doc)
-
-    return docs
-
-def store_in_faiss(docs, index_path="new_faiss_index"):
+    # Whole bank in memory; store_in_faiss(iter_documents(...)) streams instead
+    return list(iter_documents(file_path))
+
+
+def iter_batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def store_in_faiss(docs, index_path="new_faiss_index", mmap=True, batch_size=EMBED_BATCH_SIZE):
+    # docs can be any iterable (e.g. iter_documents); only one batch of documents is held at a time.
+    # mmap=True also writes the pickle-free memory-mapped layout (see index_format.py) into index_path
     if os.path.exists(index_path):
         print(f"🔄 FAISS index already exists at {index_path}.")
         return
 
+    from langchain_community.vectorstores import FAISS
+
     print("⚙️ Creating FAISS index using Ollama...")
-    db = FAISS.from_documents(docs, embeddings)
-    db.save_local(index_path)
+    db = None
+    with span("embedding.build_index", index=index_path) as s:
+        for batch in iter_batches(docs, batch_size):
+            with span("embedding.batch") as b:
+                if db is None:
+                    db = FAISS.from_documents(batch, get_embeddings())
+                else:
+                    db.add_documents(batch)
+                b.add_items(len(batch))
+            s.add_items(len(batch))
+            s.add_bytes(sum(len(d.page_content) for d in batch))
+    if db is None:
+        print("⚠️ No questions to index.")
+        return
+    with span("embedding.save_index", index=index_path):
+        db.save_local(index_path)
+    if mmap:
+        save_from_langchain(db, index_path, EMBEDDING_MODEL)
     print(f"✅ Stored in FAISS at: {index_path}")
 
 if __name__ == "__main__":
-    questions = load_questions("/Users/sanatwalia/Desktop/Zomato_Showcasing/coe-project/questions.json")
-    store_in_faiss(questions)
+    store_in_faiss(iter_documents("/Users/sanatwalia/Desktop/Zomato_Showcasing/coe-project/questions.json"))
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+# One question per line, e.g.
+# {"id": "q_3f2a9c0d1b7e4a56", "question": "...", "topic": "...", "subtopic": "...", "marks": 1, ...}
+# The nested {"1_mark": [...], "2_mark": [...]} layout is still supported as an import/export format.
+
+NESTED_SUFFIX = ".json"
+
+
+def question_id(q):
+    # Stable across runs: derived from the question text and its marks bucket
+    key = f"{q.get('marks', 0)}|{q.get('question', '').strip().lower()}"
+    return "q_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def with_id(q):
+    if not q.get("id"):
+        q = {**q, "id": question_id(q)}
+    return q
+
+
+def marks_key(marks):
+    return f"{marks}_mark"
+
+
+def is_nested_file(path):
+    return str(path).lower().endswith(NESTED_SUFFIX)
+
+
+def iter_nested(path):
+    # The nested layout has to be parsed whole; yield from it so callers stay streaming
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for _, questions in data.items():
+        for q in questions:
+            yield with_id(q)
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield with_id(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON line ({e})") from e
+
+
+def iter_questions(path):
+    if is_nested_file(path):
+        return iter_nested(path)
+    return iter_jsonl(path)
+
+
+def iter_jsonl_lines(lines):
+    # Same as iter_jsonl, for already-open text (e.g. a Streamlit upload)
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if line:
+            yield with_id(json.loads(line))
+
+
+def write_questions(questions, path):
+    # Write to a temp file and swap it in, so a crash never leaves a half-written store
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(with_id(q), ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def append_questions(questions, path):
+    count = 0
+    with open(path, "a", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(with_id(q), ensure_ascii=False))
+            f.write("\n")
+            count += 1
+        f.flush()
+    return count
+
+
+def append_question(q, path):
+    return append_questions([q], path)
+
+
+def to_nested(questions):
+    nested = {}
+    for q in questions:
+        q = dict(q)
+        q.pop("id", None)
+        nested.setdefault(marks_key(q.get("marks", 0)), []).append(q)
+    return nested
+
+
+def export_nested(src_path, dst_path):
+    nested = to_nested(iter_questions(src_path))
+    with open(dst_path, "w", encoding="utf-8") as f:
+        json.dump(nested, f, indent=2, ensure_ascii=False)
+    return sum(len(v) for v in nested.values())
+
+
+def import_nested(src_path, dst_path):
+    return write_questions(iter_nested(src_path), dst_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python -m Store_and_embed.question_store import|export <src> <dst>")
+        sys.exit(1)
+
+    action, src, dst = sys.argv[1:]
+    if action == "import":
+        n = import_nested(src, dst)
+    else:
+        n = export_nested(src, dst)
+    print(f"✅ {action.capitalize()}ed {n} question(s): {src} → {dst}")
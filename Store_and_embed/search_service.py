@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import time
+
+from instrumentation.spans import prometheus_text, span
+from Store_and_embed.filters import smart_filter
+from Store_and_embed.index_format import as_vector_index
+from Store_and_embed.ollama_store import EMBEDDING_MODEL
+
+# Long-running search API: the FAISS index stays in memory, query embeddings go through one
+# keep-alive connection pool to Ollama, and concurrent queries are micro-batched into a single
+# embedding call and a single FAISS search.
+#
+#   python -m Store_and_embed.search_service --index new_faiss_index --port 8080
+#   curl -s localhost:8080/search -d '{"query": "text classification", "marks": 3,
+#        "difficulty": "medium", "cognitive": "applying"}'
+#
+# "k" is clamped to 1..MAX_K; the smart filter applies only when marks, difficulty and cognitive
+# are all given, and a request with just some of them is rejected with 400.
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+MAX_K = 100
+FILTER_FIELDS = ("marks", "difficulty", "cognitive")
+
+
+class OllamaEmbedClient:
+    """Async client for Ollama's /api/embed that reuses pooled keep-alive connections."""
+
+    def __init__(self, base_url=DEFAULT_OLLAMA_URL, model=EMBEDDING_MODEL, pool_size=8, timeout_s=30):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.pool_size = pool_size
+        self.timeout_s = timeout_s
+        self.session = None
+
+    async def start(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def embed(self, texts):
+        with span("service.embed", model=self.model) as s:
+            async with self.session.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": texts},
+            ) as resp:
+                resp.raise_for_status()
+                payload = await resp.json()
+            s.add_items(len(texts))
+        return payload["embeddings"]
+
+
+class SearchRequest:
+    def __init__(self, query, k):
+        self.query = query
+        self.k = k
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class MicroBatcher:
+    """Collects queries for up to ``max_wait_ms`` (or ``max_batch`` queries) and serves them together.
+
+    Up to ``max_in_flight`` batches are served concurrently (one per pooled Ollama connection), so a
+    slow embedding call does not hold up the batches queued behind it.
+    """
+
+    def __init__(self, db, embedder, max_batch=32, max_wait_ms=5, max_in_flight=8):
+        self.index = as_vector_index(db)
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.in_flight = set()
+        self.slots = None
+
+    def start(self):
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.worker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        tasks = [t for t in (self.worker, *self.in_flight) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def search(self, query, k):
+        request = SearchRequest(query, k)
+        await self.queue.put(request)
+        return await request.future
+
+    async def collect(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        while True:
+            # Wait for a free slot before collecting, so queued queries keep batching while all slots are busy
+            await self.slots.acquire()
+            batch = await self.collect()
+            task = asyncio.create_task(self.dispatch(batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def dispatch(self, batch):
+        try:
+            results = await self.serve(batch)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+        for request, docs in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(docs)
+
+    async def serve(self, batch):
+        import numpy as np
+
+        with span("service.batch") as s:
+            s.add_items(len(batch))
+            vectors = await self.embedder.embed([r.query for r in batch])
+            vectors = np.asarray(vectors, dtype="float32")
+            k = max(r.k for r in batch)
+            # FAISS / numpy release the GIL, so the search runs off the event loop
+            _, ids = await asyncio.get_running_loop().run_in_executor(None, self.index.search_vectors, vectors, k)
+            return [self.lookup(row[: r.k]) for r, row in zip(batch, ids)]
+
+    def lookup(self, ids):
+        return [self.index.get_document(int(i)) for i in ids if i != -1]
+
+
+def doc_to_json(doc):
+    return {"question": doc.page_content, **doc.metadata}
+
+
+def parse_int(body, field, default=None):
+    # Accepts JSON integers and integer strings ("3"); rejects floats, booleans and anything else
+    value = body.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{field}' must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"'{field}' must be an integer") from None
+
+
+def parse_search_body(body, default_k=20, max_k=MAX_K):
+    # Returns (query, k, filters or None); raises ValueError with a client-facing message
+    if not isinstance(body, dict) or not isinstance(body.get("query"), str) or not body["query"].strip():
+        raise ValueError("expected JSON body with a non-empty 'query' string")
+
+    k = min(max(parse_int(body, "k", default_k), 1), max_k)
+
+    given = [f for f in FILTER_FIELDS if body.get(f) not in (None, "")]
+    if not given:
+        return body["query"], k, None
+    if len(given) != len(FILTER_FIELDS):
+        raise ValueError(f"'marks', 'difficulty' and 'cognitive' must be given together (got {', '.join(given)})")
+    marks = parse_int(body, "marks")
+    if not isinstance(body["difficulty"], str) or not isinstance(body["cognitive"], str):
+        raise ValueError("'difficulty' and 'cognitive' must be strings")
+    return body["query"], k, (marks, body["difficulty"], body["cognitive"])
+
+
+def build_app(db, embedder, max_batch=32, max_wait_ms=5, default_k=20):
+    from aiohttp import web
+
+    batcher = MicroBatcher(
+        db, embedder, max_batch=max_batch, max_wait_ms=max_wait_ms,
+        max_in_flight=getattr(embedder, "pool_size", 8),
+    )
+    index = batcher.index
+
+    async def on_startup(app):
+        await embedder.start()
+        batcher.start()
+
+    async def on_cleanup(app):
+        await batcher.stop()
+        await embedder.close()
+
+    async def handle_search(request):
+        try:
+            query, k, filters = parse_search_body(await request.json(), default_k)
+        except ValueError as e:
+            return web.json_response({"error": str(e) or "invalid JSON body"}, status=400)
+
+        with span("service.request", k=k):
+            docs = await batcher.search(query, k)
+            if filters is not None:
+                docs = smart_filter(docs, *filters)
+        return web.json_response({"count": len(docs), "results": [doc_to_json(d) for d in docs]})
+
+    async def handle_health(request):
+        return web.json_response({"status": "ok", "vectors": index.ntotal})
+
+    async def handle_metrics(request):
+        return web.Response(text=prometheus_text(), content_type="text/plain")
+
+    app = web.Application()
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/search", handle_search)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+def main(argv=None):
+    from aiohttp import web
+
+    from Store_and_embed.ollama_search import INDEX_PATH, load_index
+
+    parser = argparse.ArgumentParser(description="Serve FAISS question search over HTTP")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ollama-url", default=DEFAULT_OLLAMA_URL)
+    parser.add_argument("--pool-size", type=int, default=8, help="Max keep-alive connections to Ollama")
+    parser.add_argument("--max-batch", type=int, default=32, help="Max queries per embedding call / FAISS search")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="How long to wait to fill a batch")
+    args = parser.parse_args(argv)
+
+    db = load_index(args.index)
+    print(f"✅ Loaded index {args.index} ({as_vector_index(db).ntotal} vectors)")
+    embedder = OllamaEmbedClient(args.ollama_url, pool_size=args.pool_size)
+    app = build_app(db, embedder, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
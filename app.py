@@ -2,6 +2,10 @@
 import os
 import io
 import json
+import shutil
+import tempfile
+import threading
+import weakref
 from pathlib import Path
 
 import streamlit as st
@@ -15,19 +19,67 @@ except Exception as e:
     _refine_import_error = str(e)
 
 try:
-    from Clean_subtopics.subtopics import extract_subtopic
+    from Clean_subtopics.subtopics import SubtopicNormalizer, extract_subtopic
 except Exception as e:
+    SubtopicNormalizer = None
     extract_subtopic = None
     _subtopics_import_error = str(e)
 
-# Ollama + FAISS parts
 try:
+    from Store_and_embed.question_store import iter_jsonl_lines, with_id
+except Exception as e:
+    iter_jsonl_lines = None
+    with_id = None
+    _store_import_error = str(e)
+
+from instrumentation.spans import MemorySink, bind_sink, render_streamlit_panel, span
+from Store_and_embed.filters import difficulty_of, smart_filter
+from Store_and_embed.index_format import META_FILE, is_mmap_index, load_mmap_index, save_from_langchain
+
+# The modules above are cheap to import (OCR/OpenCV/LangChain load inside the functions that need them).
+# Streamlit re-runs this script on every interaction, so the Ollama + FAISS parts are only imported
+# on first use of steps 3/4 and then cached for the lifetime of the server process.
+@st.cache_resource(show_spinner=False)
+def load_vector_backend():
     from langchain_community.vectorstores import FAISS
     from langchain_ollama import OllamaEmbeddings
-except Exception as e:
-    FAISS = None
-    OllamaEmbeddings = None
-    _faiss_import_error = str(e)
+
+    return FAISS, OllamaEmbeddings(model="nomic-embed-text:latest")
+
+
+def vector_backend():
+    try:
+        FAISS, embeddings = load_vector_backend()
+        return FAISS, embeddings, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+@st.cache_resource(show_spinner=False)
+def index_slot(index_path):
+    # One cached slot per index path (not per mtime), so a rebuild replaces the loaded index
+    # instead of adding another one that lives for the rest of the server's life
+    return {"lock": threading.Lock(), "mtime": None, "db": None}
+
+
+def open_index(index_path):
+    FAISS, embeddings = load_vector_backend()
+    if is_mmap_index(index_path):
+        # Memory-mapped vectors: shared page cache across Streamlit workers, no unpickling
+        return load_mmap_index(index_path, embeddings)
+    with span("search.load_index", index=index_path):
+        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+
+
+def load_faiss_index(index_path, index_mtime):
+    slot = index_slot(index_path)
+    with slot["lock"]:
+        if slot["db"] is None or slot["mtime"] != index_mtime:
+            # The old index is only dropped, not closed: a session still searching it keeps it alive,
+            # and its file handles and mappings are released once the last reference goes
+            slot["db"] = open_index(index_path)
+            slot["mtime"] = index_mtime
+        return slot["db"]
 
 
 st.set_page_config(page_title="LLM Question Paper Pipeline", layout="wide")
@@ -49,14 +101,32 @@ with st.sidebar:
     st.subheader("Environment Notes")
     st.write("• Requires: `pytesseract`, `tesseract` binary, `PyMuPDF`, `opencv-python`, `langchain-community`, `langchain-ollama`, `faiss-cpu` (or faiss).")
     st.write("• Ollama must be running locally if you use `OllamaEmbeddings`.")
-    st.write("• Make sure your `questions.json` follows the expected format.")
+    st.write("• Make sure your `questions.json` / `questions.jsonl` follows the expected format.")
 
     st.markdown("---")
     st.markdown("**Index Folder (FAISS):**")
     default_index = st.text_input("Index path", value="new_faiss_index")
 
+    st.markdown("---")
+    show_timings = st.checkbox("Show timings panel", value=False)
+
+
+def iter_uploaded_questions(uploaded):
+    # JSONL uploads are streamed line by line; nested .json uploads are flattened
+    if uploaded.name.lower().endswith(".jsonl"):
+        yield from iter_jsonl_lines(io.TextIOWrapper(uploaded, encoding="utf-8"))
+    else:
+        data = json.loads(uploaded.read().decode("utf-8"))
+        for _, questions in data.items():
+            for q in questions:
+                yield with_id(q)
+
 
 # --- Shared session state ---
+if "timing_sink" not in st.session_state:
+    st.session_state.timing_sink = MemorySink()
+# Bound to this session's script thread only (not the shared registry), so it goes away with the session
+bind_sink(st.session_state.timing_sink)
 if "refined_text" not in st.session_state:
     st.session_state.refined_text = ""
 if "cleaned_questions" not in st.session_state:
@@ -65,6 +135,22 @@ if "search_results" not in st.session_state:
     st.session_state.search_results = []
 
 
+class SessionUploads:
+    # Private temp folder for one session's uploads. Every upload gets its own subfolder, so the
+    # [DIAGRAM CROP] paths in refined text and question "image" fields stay valid for the whole
+    # session; the folder is removed when Streamlit drops the session state (or the server exits).
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="coe_upload_")
+        weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+    def new_upload_dir(self):
+        return tempfile.mkdtemp(prefix="upload_", dir=self.path)
+
+
+if "uploads" not in st.session_state:
+    st.session_state.uploads = SessionUploads()
+
+
 # =============================
 # 1) OCR & Refinement
 # =============================
@@ -88,7 +174,9 @@ if page.startswith("1"):
             output_text = st.session_state.manual_text.strip()
         elif uploaded is not None:
             suffix = Path(uploaded.name).suffix.lower()
-            tmp_path = Path("uploaded_input" + suffix)
+            # The upload and its diagram crops go in a fresh subfolder of this session's folder,
+            # so crops never mix across uploads or users and earlier crop paths keep working
+            tmp_path = Path(st.session_state.uploads.new_upload_dir()) / ("uploaded_input" + suffix)
             with open(tmp_path, "wb") as f:
                 f.write(uploaded.read())
 
@@ -133,7 +221,7 @@ elif page.startswith("2"):
     st.header("2) Subtopic Cleanup")
     st.write("Clean and normalize `subtopic` fields in your question JSON using rules from `subtopics.py`.")
 
-    uploaded_json = st.file_uploader("Upload questions JSON", type=["json"])
+    uploaded_json = st.file_uploader("Upload questions JSON / JSONL", type=["json", "jsonl"])
     sample = st.checkbox("Load minimal sample JSON structure", value=False)
 
     data = None
@@ -148,7 +236,29 @@ elif page.startswith("2"):
         }
         data = sample_data
 
-    if uploaded_json is not None:
+    if uploaded_json is not None and uploaded_json.name.lower().endswith(".jsonl"):
+        if extract_subtopic is None or iter_jsonl_lines is None:
+            st.error("`extract_subtopic` / question store not available")
+        else:
+            # Stream JSONL straight through the cleaner without building the nested document
+            try:
+                normalizer = SubtopicNormalizer()
+                questions = list(iter_uploaded_questions(uploaded_json))
+                normalizer.learn_aliases(q.get("subtopic", "") for q in questions)
+                cleaned_lines = []
+                for q in questions:
+                    q["subtopic"] = normalizer.normalize(q.get("subtopic", ""))
+                    cleaned_lines.append(json.dumps(q, ensure_ascii=False))
+                normalizer.report_cache()
+                st.success(f"Subtopics cleaned for {len(cleaned_lines)} question(s).")
+                st.download_button(
+                    "Download cleaned questions.jsonl",
+                    data=("\n".join(cleaned_lines) + "\n").encode("utf-8"),
+                    file_name="questions.cleaned.jsonl"
+                )
+            except Exception as e:
+                st.error(f"Invalid JSONL: {e}")
+    elif uploaded_json is not None:
         try:
             data = json.loads(uploaded_json.read().decode("utf-8"))
         except Exception as e:
@@ -161,11 +271,13 @@ elif page.startswith("2"):
         if extract_subtopic is None:
             st.error("`extract_subtopic` not available from subtopics.py")
         else:
-            # Apply cleanup
+            # Apply cleanup (each distinct raw subtopic is normalized once)
+            normalizer = SubtopicNormalizer()
+            normalizer.learn_aliases(q.get("subtopic", "") for questions in data.values() for q in questions)
             for marks_key, questions in data.items():
-                for q in questions:
-                    original = q.get("subtopic", "")
-                    q["subtopic"] = extract_subtopic(original)
+                cleaned = normalizer.normalize_batch([q.get("subtopic", "") for q in questions])
+                for q, subtopic in zip(questions, cleaned):
+                    q["subtopic"] = subtopic
 
             st.success("Subtopics cleaned.")
             st.subheader("Cleaned JSON")
@@ -178,8 +290,8 @@ elif page.startswith("2"):
                 data=json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"),
                 file_name="questions.cleaned.json"
             )
-    else:
-        st.info("Upload your `questions.json` or tick the sample to see how cleanup works.")
+    elif uploaded_json is None:
+        st.info("Upload your `questions.json` / `questions.jsonl` or tick the sample to see how cleanup works.")
 
 
 # =============================
@@ -189,37 +301,36 @@ elif page.startswith("3"):
     st.header("3) Build Vector Store (FAISS)")
     st.write("Embeds questions using **Ollama Embeddings** and stores them in a **FAISS** index.")
 
-    if FAISS is None or OllamaEmbeddings is None:
-        st.error("FAISS/Ollama packages not available.")
-        if "_faiss_import_error" in globals():
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.write("Provide cleaned questions JSON or JSONL (from step 2).")
+        uploaded_json = st.file_uploader("Upload cleaned questions.json / questions.jsonl", type=["json", "jsonl"], key="faiss_json")
+    with col2:
+        rebuild = st.checkbox("Overwrite if index exists")
+
+    if st.button("Build Index", type="primary"):
+        FAISS, embeddings, _faiss_import_error = vector_backend()
+        if FAISS is None:
+            st.error("FAISS/Ollama packages not available.")
             st.code(_faiss_import_error)
-    else:
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.write("Provide cleaned questions JSON (from step 2).")
-            uploaded_json = st.file_uploader("Upload cleaned questions.json", type=["json"], key="faiss_json")
-        with col2:
-            rebuild = st.checkbox("Overwrite if index exists")
-
-        if st.button("Build Index", type="primary"):
+        else:
             if uploaded_json is None:
                 st.warning("Please upload cleaned questions.json first.")
             else:
                 try:
-                    data = json.loads(uploaded_json.read().decode("utf-8"))
                     # Build Documents list
                     from langchain.schema import Document
                     docs = []
-                    for mark_group, questions in data.items():
-                        for q in questions:
-                            meta = {
-                                "topic": q.get("topic"),
-                                "subtopic": q.get("subtopic"),
-                                "marks": q.get("marks"),
-                                "difficulty": q.get("difficulty"),
-                                "cognitive_level": q.get("cognitive_level"),
-                            }
-                            docs.append(Document(page_content=q.get("question", ""), metadata=meta))
+                    for q in iter_uploaded_questions(uploaded_json):
+                        meta = {
+                            "id": q.get("id"),
+                            "topic": q.get("topic"),
+                            "subtopic": q.get("subtopic"),
+                            "marks": q.get("marks"),
+                            "difficulty": q.get("difficulty"),
+                            "cognitive_level": q.get("cognitive_level"),
+                        }
+                        docs.append(Document(page_content=q.get("question", ""), metadata=meta))
 
                     index_path = Path(default_index)
                     if index_path.exists() and not rebuild:
@@ -231,9 +342,12 @@ elif page.startswith("3"):
                             shutil.rmtree(index_path, ignore_errors=True)
 
                         st.write("Creating FAISS index…")
-                        embeddings = OllamaEmbeddings(model="nomic-embed-text:latest")
-                        db = FAISS.from_documents(docs, embeddings)
-                        db.save_local(str(index_path))
+                        with span("embedding.build_index", index=str(index_path)) as s:
+                            db = FAISS.from_documents(docs, embeddings)
+                            s.add_items(len(docs))
+                        with span("embedding.save_index", index=str(index_path)):
+                            db.save_local(str(index_path))
+                        save_from_langchain(db, str(index_path), "nomic-embed-text:latest")
                         st.success(f"Stored FAISS at `{index_path}`")
                 except Exception as e:
                     st.error(f"Failed to build index: {e}")
@@ -259,36 +373,21 @@ elif page.startswith("4"):
     run_btn = st.button("Search", type="primary")
 
     if run_btn:
-        if FAISS is None or OllamaEmbeddings is None:
+        FAISS, embeddings, _faiss_import_error = vector_backend()
+        if FAISS is None:
             st.error("FAISS/Ollama not available in this environment.")
+            st.code(_faiss_import_error)
         else:
             try:
-                embeddings = OllamaEmbeddings(model="nomic-embed-text:latest")
-                db = FAISS.load_local(default_index, embeddings, allow_dangerous_deserialization=True)
-
-                docs = db.similarity_search(query, k=15)
-
-                def smart_filter(docs, marks, difficulty, cognitive):
-                    exact = [d for d in docs if str(d.metadata.get("marks")) == str(marks)
-                                           and d.metadata.get("difficulty") == difficulty
-                                           and d.metadata.get("cognitive_level") == cognitive]
-                    if exact:
-                        return exact
-                    # relax difficulty
-                    relaxed1 = [d for d in docs if str(d.metadata.get("marks")) == str(marks)
-                                               and d.metadata.get("cognitive_level") == cognitive]
-                    if relaxed1:
-                        return relaxed1
-                    # relax cognitive
-                    relaxed2 = [d for d in docs if str(d.metadata.get("marks")) == str(marks)
-                                               and d.metadata.get("difficulty") == difficulty]
-                    if relaxed2:
-                        return relaxed2
-                    # fallback any marks match
-                    relaxed3 = [d for d in docs if str(d.metadata.get("marks")) == str(marks)]
-                    return relaxed3 or docs
-
-                filtered = smart_filter(docs, marks, difficulty, cognitive)
+                index_file = Path(default_index) / (META_FILE if is_mmap_index(default_index) else "index.faiss")
+                db = load_faiss_index(default_index, index_file.stat().st_mtime if index_file.exists() else 0)
+
+                with span("search.similarity", k=15) as s:
+                    docs = db.similarity_search(query, k=15)
+                    s.add_items(len(docs))
+
+                with span("search.filter"):
+                    filtered = smart_filter(docs, marks, difficulty, cognitive)
 
                 st.session_state.search_results = [
                     {
@@ -296,7 +395,7 @@ elif page.startswith("4"):
                         "topic": d.metadata.get("topic"),
                         "subtopic": d.metadata.get("subtopic"),
                         "marks": d.metadata.get("marks"),
-                        "difficulty": d.metadata.get("difficulty"),
+                        "difficulty": difficulty_of(d.metadata),
                         "cognitive_level": d.metadata.get("cognitive_level"),
                     }
                     for d in filtered
@@ -338,3 +437,8 @@ elif page.startswith("5"):
         )
     else:
         st.info("No search results yet. Run step 4 first.")
+
+
+if show_timings:
+    st.markdown("---")
+    render_streamlit_panel(st, st.session_state.timing_sink)
@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+# Usage: python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+# Exit code 1 if any benchmark's median got slower by more than the threshold, or if a benchmark
+# that was ok in the baseline failed in the candidate.
+
+
+def key(entry):
+    return entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return report["meta"], {key(e): e for e in report["results"]}
+
+
+def compare(baseline_path, candidate_path, threshold=0.10):
+    base_meta, base_all = load(baseline_path)
+    cand_meta, cand_all = load(candidate_path)
+    base = {k: e for k, e in base_all.items() if e.get("status") == "ok"}
+    cand = {k: e for k, e in cand_all.items() if e.get("status") == "ok"}
+
+    print(f"baseline:  {base_meta.get('revision')} ({base_meta.get('timestamp')})")
+    print(f"candidate: {cand_meta.get('revision')} ({cand_meta.get('timestamp')})\n")
+    print(f"{'benchmark':<32} {'params':<44} {'base ms':>10} {'cand ms':>10} {'change':>8}")
+
+    regressions = []
+    for k in sorted(set(base) & set(cand)):
+        before, after = base[k]["median_s"], cand[k]["median_s"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = " ⚠️"
+            regressions.append(k)
+        elif change < -threshold:
+            flag = " ✅"
+        print(f"{k[0]:<32} {k[1][:44]:<44} {before * 1000:>10.3f} {after * 1000:>10.3f} {change:>+7.1%}{flag}")
+
+    for k in sorted(set(base) - set(cand)):
+        # Failed entries carry no params, so match them by name
+        failed = [e for e in cand_all.values() if e["name"] == k[0] and e.get("status") == "failed"]
+        if failed:
+            print(f"{k[0]:<32} {k[1][:44]:<44} failed in candidate: {failed[0]['reason']} ⚠️")
+            regressions.append(k)
+        else:
+            print(f"{k[0]:<32} {k[1][:44]:<44} only in baseline")
+    for k in sorted(set(cand) - set(base)):
+        print(f"{k[0]:<32} {k[1][:44]:<44} only in candidate")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    regressions = compare(args.baseline, args.candidate, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
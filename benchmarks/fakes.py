@@ -0,0 +1,104 @@
+import hashlib
+import re
+import time
+
+# Deterministic local stand-ins for Ollama and Tesseract, so benchmarks run offline and repeatably.
+
+
+def stable_seed(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeEmbeddings:
+    """Drop-in for OllamaEmbeddings: the same text always maps to the same unit vector."""
+
+    def __init__(self, dim=768, delay_s=0.0):
+        self.dim = dim
+        self.delay_s = delay_s
+        self.calls = 0
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        import numpy as np
+
+        self.calls += 1
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        vectors = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            vectors[i] = np.random.default_rng(stable_seed(text)).standard_normal(self.dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.tolist()
+
+
+class CannedLLM:
+    """Stands in for a prompt | llm | parser chain: ``invoke(inputs)`` returns a canned answer.
+
+    Question prompts get a question derived from the chunk (unique per chunk, so the
+    generator's dedup behaves as with a real model); subtopic prompts get the kind of
+    chatty answer llama3 produces, so the cleanup regexes have real work to do.
+    """
+
+    SUBTOPICS = ["Neural Networks", "Generative Models", "Natural Language Processing (NLP)", "Computer Vision", "AI Ethics"]
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.calls = 0
+        self.text_inputs = []
+
+    def invoke(self, inputs):
+        self.calls += 1
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        if "text" in inputs:
+            self.text_inputs.append(inputs["text"])
+            words = re.findall(r"[A-Za-z]{4,}", inputs["text"])[:6]
+            return f"What is the role of {' '.join(words) or 'this concept'} ({stable_seed(inputs['text']) % 10007})?"
+        label = self.SUBTOPICS[stable_seed(inputs.get("question", "")) % len(self.SUBTOPICS)]
+        return f'The best subtopic for this question would be:\n\n"{label}"\n\nThis is because ...'
+
+
+class StubOCR:
+    """Replaces ``pytesseract.image_to_string`` / ``image_to_data``: returns canned page text instead of running tesseract."""
+
+    def __init__(self, pages):
+        self.pages = pages or ["Lorem ipsum dolor sit amet"]
+        self.calls = 0
+
+    def image_to_string(self, image, *args, **kwargs):
+        text = self.pages[self.calls % len(self.pages)]
+        self.calls += 1
+        return text
+
+    def image_to_data(self, image, *args, **kwargs):
+        # Same keys as pytesseract.Output.DICT; words laid out on a fixed grid, ~12 words per line
+        data = {key: [] for key in ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                                    "left", "top", "width", "height", "conf", "text")}
+        words = self.image_to_string(image).split()
+        for n, word in enumerate(words):
+            line, pos = divmod(n, 12)
+            block = line // 10 + 1
+            for key, value in (("level", 5), ("page_num", 1), ("block_num", block), ("par_num", 1),
+                               ("line_num", line + 1), ("word_num", pos + 1), ("left", 100 + pos * 150),
+                               ("top", 100 + line * 60), ("width", 20 * len(word)), ("height", 40),
+                               ("conf", 95), ("text", word)):
+                data[key].append(value)
+        return data
+
+
+class FakeDocument:
+    """Minimal stand-in for langchain's Document (page_content + metadata)."""
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+def load_sample_pages(path):
+    # Split an extracted_output.txt into its per-page OCR text
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    pages = re.split(r"--- Page \d+ ---", text)
+    return [p.strip() for p in pages if p.strip()]
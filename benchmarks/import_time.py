@@ -0,0 +1,109 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Usage: python -m benchmarks.import_time [--repeat 5]
+# Imports each entry module in a fresh interpreter (python -X importtime) and fails if it
+# exceeds its budget or pulls in any of the heavy dependencies below at import time.
+
+IMPORT_BUDGETS_MS = {
+    "instrumentation.spans": 50,
+    "Store_and_embed.question_store": 50,
+    "Store_and_embed.filters": 50,
+    "Clean_subtopics.subtopics": 75,
+    "Pytesseract.refinement": 75,
+    "questions_generation.chunker": 50,
+    "questions_generation.question_gen": 75,
+    "Store_and_embed.ollama_store": 75,
+    "Store_and_embed.ollama_search": 75,
+}
+
+HEAVY_MODULES = [
+    "cv2", "fitz", "PIL", "pytesseract", "numpy", "faiss", "torch", "transformers",
+    "langchain", "langchain_core", "langchain_community", "langchain_ollama", "streamlit",
+]
+
+# __import__ rather than importlib.import_module: only the former is reported by -X importtime
+PROBE = (
+    "import json, sys\n"
+    "__import__({module!r})\n"
+    "heavy = {heavy!r}\n"
+    "print(json.dumps(sorted(m for m in heavy if m in sys.modules)))\n"
+)
+
+
+def probe(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1]}
+
+    # "import time: self [us] | cumulative | imported package"
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    return {
+        "module": module,
+        "cumulative_ms": cumulative_us / 1000 if cumulative_us is not None else None,
+        "heavy_loaded": json.loads(proc.stdout.strip().splitlines()[-1]),
+    }
+
+
+def measure_imports(repeat=3, budgets=None):
+    budgets = budgets or IMPORT_BUDGETS_MS
+    results = []
+    for module, budget in budgets.items():
+        runs = [probe(module) for _ in range(repeat)]
+        errors = [r["error"] for r in runs if "error" in r]
+        if errors:
+            results.append({"module": module, "budget_ms": budget, "status": "error", "error": errors[0]})
+            continue
+        timings = sorted(r["cumulative_ms"] for r in runs)
+        median = timings[len(timings) // 2]
+        heavy = runs[-1]["heavy_loaded"]
+        ok = median <= budget and not heavy
+        results.append({
+            "module": module,
+            "budget_ms": budget,
+            "median_ms": median,
+            "min_ms": timings[0],
+            "heavy_loaded": heavy,
+            "status": "ok" if ok else "over_budget",
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import-time budgets of the pipeline entry points")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = measure_imports(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            if r["status"] == "error":
+                print(f"❌ {r['module']:<36} import failed: {r['error']}")
+                continue
+            mark = "✅" if r["status"] == "ok" else "❌"
+            heavy = f"  heavy: {', '.join(r['heavy_loaded'])}" if r["heavy_loaded"] else ""
+            print(f"{mark} {r['module']:<36} {r['median_ms']:>7.1f} ms / {r['budget_ms']} ms{heavy}")
+
+    if any(r["status"] != "ok" for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
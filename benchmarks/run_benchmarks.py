@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fakes import CannedLLM, FakeDocument, FakeEmbeddings, StubOCR, load_sample_pages  # noqa: E402
+
+# Usage:
+#   python -m benchmarks.run_benchmarks --out bench/main.json
+#   python -m benchmarks.run_benchmarks --sizes 1000,10000,100000,1000000 --only faiss
+#   python -m benchmarks.compare bench/main.json bench/branch.json
+
+SAMPLE_PDF = ROOT / "pdf_extract.pdf"
+SAMPLE_TEXT = ROOT / "questions_generation" / "extracted_output.txt"
+SAMPLE_KEYWORDS = ROOT / "questions_generation" / "keyword.json"
+
+MARKS = [1, 2, 3, 5]
+DIFFICULTIES = ["easy", "medium", "hard"]
+COGNITIVE = ["remembering", "understanding", "applying", "analyzing", "evaluating", "creating"]
+
+
+def measure(fn, repeat=5, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_s": samples[0],
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "p95_s": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+    }
+
+
+def result(name, params, stats=None, units=None, skipped=None, failed=None):
+    # skipped: the benchmark cannot run here (missing dependency); failed: it ran but did not do its work
+    entry = {"name": name, "params": params}
+    if skipped or failed:
+        entry["status"] = "skipped" if skipped else "failed"
+        entry["reason"] = skipped or failed
+        return entry
+    entry["status"] = "ok"
+    entry.update(stats)
+    if units:
+        # units = (count, label), e.g. (len(text), "bytes") -> bytes_per_s
+        count, label = units
+        entry[f"{label}_per_s"] = count / stats["median_s"] if stats["median_s"] else None
+    return entry
+
+
+# --- Benchmarks ---
+
+def bench_ocr(args):
+    try:
+        import fitz  # noqa: F401
+        from Pytesseract import refinement
+        pytesseract = refinement.load_pytesseract()
+    except ImportError as e:
+        return [result("ocr.handle_pdf", {"file": SAMPLE_PDF.name}, skipped=f"import failed: {e}")]
+
+    # Only tesseract is stubbed: PDF rendering, PNG round trip and refinement are measured for real
+
+    ocr = StubOCR(load_sample_pages(SAMPLE_TEXT))
+    original = pytesseract.image_to_string, pytesseract.image_to_data
+    pytesseract.image_to_string, pytesseract.image_to_data = ocr.image_to_string, ocr.image_to_data
+    try:
+        with tempfile.TemporaryDirectory() as crops_dir:
+            # handle_pdf reports errors as a "❌ ..." string; a run that never reaches OCR must not be timed
+            output = refinement.handle_pdf(str(SAMPLE_PDF), crops_dir=crops_dir)
+            pages = ocr.calls
+            if output.startswith("❌") or not pages:
+                return [result("ocr.handle_pdf", {"file": SAMPLE_PDF.name}, failed=output.splitlines()[0] if output else "no pages OCR'd")]
+            stats = measure(lambda: refinement.handle_pdf(str(SAMPLE_PDF), crops_dir=crops_dir), repeat=args.repeat, warmup=0)
+    finally:
+        pytesseract.image_to_string, pytesseract.image_to_data = original
+    return [result("ocr.handle_pdf", {"file": SAMPLE_PDF.name, "pages": pages, "ocr": "stub"}, stats, (pages, "pages"))]
+
+
+def bench_refine(args):
+    try:
+        from Pytesseract.refinement import analyze_text, refine_text
+    except ImportError as e:
+        return [result("refine.refine_text", {}, skipped=f"import failed: {e}")]
+
+    base = SAMPLE_TEXT.read_text(encoding="utf-8")
+    results = []
+    for factor in (1, 10, 100):
+        text = base * factor
+        stats = measure(lambda: analyze_text(refine_text(text)), repeat=args.repeat)
+        results.append(result("refine.refine_text", {"bytes": len(text)}, stats, (len(text), "bytes")))
+    return results
+
+
+def bench_chunk(args):
+    from questions_generation.chunker import chunk_text, get_token_counter
+
+    base = SAMPLE_TEXT.read_text(encoding="utf-8")
+    with open(SAMPLE_KEYWORDS, "r", encoding="utf-8") as f:
+        topic_keywords = json.load(f)
+    tokenizer, _ = get_token_counter()
+    results = []
+    for factor in (1, 10, 100):
+        text = base * factor
+        chunks = chunk_text(text, topic_keywords)
+        stats = measure(lambda: chunk_text(text, topic_keywords), repeat=args.repeat)
+        params = {"bytes": len(text), "chunks": len(chunks), "tokenizer": tokenizer}
+        results.append(result("generation.chunk_text", params, stats, (len(text), "bytes")))
+    return results
+
+
+def bench_generate(args):
+    try:
+        from questions_generation import question_gen
+        from questions_generation.chunker import get_token_counter
+    except ImportError as e:
+        return [result("generation.generate_questions", {}, skipped=f"import failed: {e}")]
+
+    text = SAMPLE_TEXT.read_text(encoding="utf-8")
+    with open(SAMPLE_KEYWORDS, "r", encoding="utf-8") as f:
+        topic_keywords = json.load(f)
+
+    # Canned chains with zero latency: what is left is the generator's own orchestration cost
+    llm = CannedLLM()
+    saved = question_gen.get_question_chain, question_gen.get_subtopic_chain
+    question_gen.get_question_chain = question_gen.get_subtopic_chain = lambda: llm
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "chunks.jsonl")
+
+            def run():
+                random.seed(args.seed)
+                question_gen.generate_questions(text, topic_keywords, questions_per_category=5, chunk_index_path=index_path)
+
+            stats = measure(run, repeat=args.repeat)
+    finally:
+        question_gen.get_question_chain, question_gen.get_subtopic_chain = saved
+    calls = llm.calls // (args.repeat + 1)
+    # LLM input size is what the chunker controls: prompt text tokens per question prompt
+    _, count_tokens = get_token_counter()
+    prompt_tokens = statistics.fmean(count_tokens(t) for t in llm.text_inputs) if llm.text_inputs else 0
+    params = {"bytes": len(text), "llm": "canned", "llm_calls": calls, "prompt_text_tokens": round(prompt_tokens, 1)}
+    return [result("generation.generate_questions", params, stats, (calls, "llm_calls"))]
+
+
+def synthetic_vectors(n, dim, seed):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bench_faiss(args):
+    try:
+        import faiss
+        import numpy as np  # noqa: F401
+    except ImportError as e:
+        return [result("faiss.build", {}, skipped=f"import failed: {e}")]
+
+    results = []
+    queries = synthetic_vectors(args.queries, args.dim, args.seed + 1)
+    for n in args.sizes:
+        vectors = synthetic_vectors(n, args.dim, args.seed)
+        params = {"n": n, "dim": args.dim}
+
+        def build():
+            index = faiss.IndexFlatL2(args.dim)
+            index.add(vectors)
+            return index
+
+        stats = measure(build, repeat=max(1, args.repeat // 2), warmup=0)
+        results.append(result("faiss.build", params, stats, (n, "vectors")))
+
+        index = build()
+        stats = measure(lambda: index.search(queries[:1], args.k), repeat=args.repeat)
+        results.append(result("faiss.search.single", {**params, "k": args.k}, stats, (1, "queries")))
+        stats = measure(lambda: index.search(queries, args.k), repeat=args.repeat)
+        results.append(result("faiss.search.batch", {**params, "k": args.k, "queries": len(queries)}, stats, (len(queries), "queries")))
+        del index
+
+        results.extend(bench_mmap_index(args, vectors, queries))
+        del vectors
+
+    # End-to-end LangChain path (embedding + docstore) at the smallest size only
+    try:
+        from langchain_community.vectorstores import FAISS
+    except ImportError as e:
+        results.append(result("faiss.langchain_build", {}, skipped=f"import failed: {e}"))
+        return results
+
+    n = min(args.sizes)
+    texts = [f"Synthetic question {i} about topic {i % 50}?" for i in range(n)]
+    embeddings = FakeEmbeddings(dim=args.dim)
+    stats = measure(lambda: FAISS.from_texts(texts, embeddings), repeat=max(1, args.repeat // 2), warmup=0)
+    results.append(result("faiss.langchain_build", {"n": n, "dim": args.dim, "embeddings": "fake"}, stats, (n, "docs")))
+    db = FAISS.from_texts(texts, embeddings)
+    stats = measure(lambda: db.similarity_search("Synthetic question about topic 7", k=args.k), repeat=args.repeat)
+    results.append(result("faiss.langchain_search", {"n": n, "dim": args.dim, "k": args.k, "embeddings": "fake"}, stats, (1, "queries")))
+    return results
+
+
+def bench_mmap_index(args, vectors, queries):
+    from Store_and_embed.index_format import load_mmap_index, save_mmap_index
+
+    n = len(vectors)
+    params = {"n": n, "dim": args.dim}
+    docs = [FakeDocument(f"Synthetic question {i}?", {"marks": MARKS[i % len(MARKS)]}) for i in range(n)]
+    with tempfile.TemporaryDirectory() as path:
+        save_mmap_index(path, vectors, docs)
+        del docs
+
+        def load():
+            load_mmap_index(path).close()
+
+        results = [result("index.mmap_load", params, measure(load, repeat=args.repeat), (n, "vectors"))]
+        index = load_mmap_index(path)
+        stats = measure(lambda: index.search_vectors(queries, args.k), repeat=args.repeat)
+        results.append(result("index.mmap_search.batch", {**params, "k": args.k, "queries": len(queries)}, stats, (len(queries), "queries")))
+        index.close()
+    return results
+
+
+def synthetic_docs(n, seed):
+    rng = random.Random(seed)
+    return [
+        FakeDocument(
+            f"Synthetic question {i}?",
+            {
+                "marks": rng.choice(MARKS),
+                "difficulty": rng.choice(DIFFICULTIES),
+                "cognitive_level": rng.choice(COGNITIVE),
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def bench_filter(args):
+    from Store_and_embed.filters import smart_filter
+
+    results = []
+    for n in sorted({args.k, *args.sizes}):
+        docs = synthetic_docs(n, args.seed)
+        stats = measure(lambda: smart_filter(docs, 3, "medium", "applying"), repeat=args.repeat)
+        results.append(result("search.smart_filter", {"n": n}, stats, (n, "docs")))
+    return results
+
+
+def bench_imports(args):
+    from benchmarks.import_time import measure_imports
+
+    results = []
+    for r in measure_imports(repeat=args.repeat):
+        if r["status"] == "error":
+            results.append(result("import", {"module": r["module"]}, skipped=r["error"]))
+            continue
+        stats = {"repeat": args.repeat, "min_s": r["min_ms"] / 1000, "median_s": r["median_ms"] / 1000}
+        entry = result("import", {"module": r["module"]}, stats)
+        entry.update(budget_ms=r["budget_ms"], heavy_loaded=r["heavy_loaded"], within_budget=r["status"] == "ok")
+        results.append(entry)
+    return results
+
+
+BENCHMARKS = {
+    "imports": bench_imports,
+    "ocr": bench_ocr,
+    "refine": bench_refine,
+    "chunk": bench_chunk,
+    "generate": bench_generate,
+    "faiss": bench_faiss,
+    "filter": bench_filter,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    results = []
+    for name in args.only or BENCHMARKS:
+        print(f"⏱️  Running {name} ...", file=sys.stderr)
+        for entry in BENCHMARKS[name](args):
+            results.append(entry)
+            if entry["status"] == "ok":
+                print(f"   {entry['name']} {entry['params']}: median {entry['median_s'] * 1000:.3f} ms", file=sys.stderr)
+            else:
+                print(f"   {entry['name']}: {entry['status']} ({entry['reason']})", file=sys.stderr)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for the question pipeline")
+    parser.add_argument("--out", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run a subset of benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated bank sizes for FAISS/filter benchmarks")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (nomic-embed-text is 768)")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100, help="Queries per batched FAISS search")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✅ Results saved to {args.out}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Usage:
+#   with span("ocr.page", page=3) as s:
+#       text = pytesseract.image_to_string(img)
+#       s.add_bytes(len(text))
+#
+#   @timed("generation.llm_call")
+#   def ask(...): ...
+#
+# Every finished span is aggregated into the global registry and handed to each configured sink,
+# plus the sink bound to the current context (see bind_sink), if any.
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.bytes = 0
+        self.items = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "count": self.count,
+            "errors": self.errors,
+            "total_s": round(self.total_s, 6),
+            "mean_s": round(self.total_s / self.count, 6) if self.count else 0.0,
+            "max_s": round(self.max_s, 6),
+            "bytes": self.bytes,
+            "items": self.items,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+    def add(self, s):
+        self.count += 1
+        self.total_s += s.duration_s
+        self.max_s = max(self.max_s, s.duration_s)
+        self.bytes += s.bytes
+        self.items += s.items
+        if s.error:
+            self.errors += 1
+        self.cache_hits += s.cache_hits
+        self.cache_misses += s.cache_misses
+
+
+class Span:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.bytes = 0
+        self.items = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.error = None
+        self.start = time.perf_counter()
+        self.duration_s = 0.0
+
+    def add_bytes(self, n):
+        self.bytes += n
+
+    def add_items(self, n=1):
+        self.items += n
+
+    def mark_cache(self, hit):
+        if hit:
+            self.add_cache(hits=1)
+        else:
+            self.add_cache(misses=1)
+
+    def add_cache(self, hits=0, misses=0):
+        # For callers that count lookups themselves and report them once per batch
+        self.cache_hits += hits
+        self.cache_misses += misses
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def as_dict(self):
+        record = {"span": self.name, "duration_s": round(self.duration_s, 6)}
+        if self.bytes:
+            record["bytes"] = self.bytes
+        if self.items:
+            record["items"] = self.items
+        if self.cache_hits + self.cache_misses == 1:
+            record["cache_hit"] = bool(self.cache_hits)
+        elif self.cache_hits or self.cache_misses:
+            record["cache_hits"] = self.cache_hits
+            record["cache_misses"] = self.cache_misses
+        if self.error:
+            record["error"] = self.error
+        record.update(self.fields)
+        return record
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.sinks = []
+
+    def record(self, s):
+        with self.lock:
+            stats = self.stats.get(s.name)
+            if stats is None:
+                stats = self.stats[s.name] = StageStats(s.name)
+            stats.add(s)
+            sinks = list(self.sinks)
+
+        for sink in sinks:
+            sink.emit(s)
+        bound = _bound_sink.get()
+        if bound is not None:
+            bound.emit(s)
+
+    def snapshot(self):
+        with self.lock:
+            return [stats.as_dict() for stats in sorted(self.stats.values(), key=lambda x: x.name)]
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+registry = Registry()
+
+# Sink for the current thread / asyncio task only, e.g. one Streamlit session
+_bound_sink = contextvars.ContextVar("coe_bound_sink", default=None)
+
+
+@contextmanager
+def span(name, **fields):
+    s = Span(name, fields)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.duration_s = time.perf_counter() - s.start
+        registry.record(s)
+
+
+def timed(name=None):
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_cache(name, hits=0, misses=0, **fields):
+    # Zero-duration span summarizing cache lookups that are too cheap to time one by one
+    s = Span(name, fields)
+    s.add_cache(hits, misses)
+    s.add_items(hits + misses)
+    registry.record(s)
+
+
+# --- Sinks ---
+
+class JsonLogSink:
+    """Writes one JSON object per finished span."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def emit(self, s):
+        self.stream.write(json.dumps({"ts": time.time(), **s.as_dict()}, default=str) + "\n")
+
+
+class MemorySink:
+    """Keeps the most recent spans and per-stage totals in memory (used by the Streamlit panel)."""
+
+    def __init__(self, maxlen=500):
+        self.maxlen = maxlen
+        self.spans = []
+        self.stats = {}
+
+    def emit(self, s):
+        stats = self.stats.get(s.name)
+        if stats is None:
+            stats = self.stats[s.name] = StageStats(s.name)
+        stats.add(s)
+        self.spans.append(s.as_dict())
+        if len(self.spans) > self.maxlen:
+            del self.spans[: len(self.spans) - self.maxlen]
+
+    def snapshot(self):
+        return [stats.as_dict() for stats in sorted(self.stats.values(), key=lambda x: x.name)]
+
+
+def add_sink(sink):
+    with registry.lock:
+        registry.sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with registry.lock:
+        if sink in registry.sinks:
+            registry.sinks.remove(sink)
+
+
+def bind_sink(sink):
+    # Route spans finished in the current context (thread / asyncio task) to `sink` as well, without
+    # registering it process-wide. New threads start with an empty context, so nothing leaks across them.
+    return _bound_sink.set(sink)
+
+
+def prometheus_text(prefix="coe"):
+    # Prometheus text exposition format, suitable for a textfile collector or an HTTP /metrics handler
+    metrics = [
+        ("stage_calls_total", "counter", "count"),
+        ("stage_errors_total", "counter", "errors"),
+        ("stage_seconds_total", "counter", "total_s"),
+        ("stage_seconds_max", "gauge", "max_s"),
+        ("stage_bytes_total", "counter", "bytes"),
+        ("stage_items_total", "counter", "items"),
+        ("stage_cache_hits_total", "counter", "cache_hits"),
+        ("stage_cache_misses_total", "counter", "cache_misses"),
+    ]
+    snapshot = registry.snapshot()
+    lines = []
+    for metric, kind, field in metrics:
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for stats in snapshot:
+            lines.append(f'{prefix}_{metric}{{stage="{stats["name"]}"}} {stats[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def dump_prometheus(path, prefix="coe"):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(prefix))
+
+
+def render_streamlit_panel(st, memory_sink=None):
+    # With a session's bound MemorySink, shows that session's timings only; otherwise the process totals
+    st.subheader("⏱️ Timings")
+    snapshot = memory_sink.snapshot() if memory_sink is not None else registry.snapshot()
+    if not snapshot:
+        st.info("No timings recorded yet in this session.")
+    else:
+        st.dataframe(snapshot, use_container_width=True)
+    if memory_sink is not None and memory_sink.spans:
+        with st.expander(f"Recent spans ({len(memory_sink.spans)})"):
+            st.json(memory_sink.spans[-50:])
+    st.download_button(
+        "Download process-wide metrics (Prometheus text)",
+        data=prometheus_text().encode("utf-8"),
+        file_name="metrics.prom"
+    )
+
+
+def configure_from_env(environ=None):
+    # COE_METRICS=json -> JSON lines on stderr; COE_METRICS=json:/path/to/file.jsonl -> appended to that file
+    value = (environ or os.environ).get("COE_METRICS", "").strip()
+    if not value:
+        return None
+    kind, _, target = value.partition(":")
+    if kind == "json":
+        stream = open(target, "a", encoding="utf-8", buffering=1) if target else None
+        return add_sink(JsonLogSink(stream))
+    return None
+
+
+configure_from_env()
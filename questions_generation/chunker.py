@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+from instrumentation.spans import span
+
+# Splits handle_pdf / handle_image output into LLM-sized chunks without crossing "--- Page N ---"
+# boundaries (tiny pages such as title slides are carried into the next page), keeps the page's
+# analysis markers and diagram crops as chunk metadata instead of sending them to the LLM, and
+# sizes chunks in model tokens. The resulting chunk index is persisted as JSONL:
+#
+#   {"meta": {"source_hash": ..., "max_tokens": 160, "tokenizer": "approx", "count": N}}
+#   {"id": "c_...", "pages": [3], "start": 1042, "end": 1637, "tokens": 151, "hash": "...",
+#    "topic_counts": {"Artificial Intelligence": 4, ...}, "markers": [...], "images": [...], "text": "..."}
+#
+# start/end are character offsets of the chunk's first and last sentence in the source text.
+
+CHUNK_INDEX_VERSION = 1
+DEFAULT_MAX_TOKENS = 160  # roughly the old 500-character chunks
+DEFAULT_MIN_TOKENS = 24  # smaller pages are merged into the next one
+DEFAULT_OVERLAP_SENTENCES = 0
+
+PAGE_RE = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+MARKER_RE = re.compile(r"^\[[^\]\n]*\](?: \([^)\n]*\))?$|^\[DIAGRAM CROP\] .*$")
+DIAGRAM_CROP_RE = re.compile(r"^\[DIAGRAM CROP\] (.+?) \(x=")
+SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|$)", re.MULTILINE)
+APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+WORD_RE = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(name="auto"):
+    # "tiktoken" (if installed) approximates subword model tokenizers closely; "approx" counts
+    # words and punctuation, which is within ~15% for English text and has no dependencies.
+    if name in ("auto", "tiktoken"):
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding("cl100k_base")
+            return "tiktoken", lambda text: len(encoding.encode(text))
+        except ImportError:
+            if name == "tiktoken":
+                raise
+    return "approx", lambda text: len(APPROX_TOKEN_RE.findall(text))
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def iter_sections(text):
+    # Yields (page, markers, body, body_start); page is None for output without page headers
+    matches = list(PAGE_RE.finditer(text))
+    if not matches:
+        bounds = [(None, 0, len(text))]
+    else:
+        bounds = [
+            (int(m.group(1)), m.end(), matches[i + 1].start() if i + 1 < len(matches) else len(text))
+            for i, m in enumerate(matches)
+        ]
+
+    for page, start, end in bounds:
+        markers = []
+        pos = start
+        # Marker lines sit at the top of each section, before the OCR text
+        for line in text[start:end].splitlines(keepends=True):
+            stripped = line.strip()
+            if stripped and not MARKER_RE.match(stripped):
+                break
+            if stripped:
+                markers.append(stripped)
+            pos += len(line)
+        yield page, markers, text[pos:end], pos
+
+
+def iter_sentences(body, body_start):
+    for m in SENTENCE_RE.finditer(body):
+        sentence = m.group(0).strip()
+        if sentence:
+            lead = len(m.group(0)) - len(m.group(0).lstrip())
+            start = body_start + m.start() + lead
+            yield sentence, start, start + len(sentence)
+
+
+def split_long_sentence(sentence, start, count_tokens, max_tokens):
+    # refine_text collapses each page to one line and slides often lack punctuation, so a "sentence"
+    # can be a whole page: cut it at word boundaries into pieces of at most max_tokens
+    tokens = count_tokens(sentence)
+    if tokens <= max_tokens:
+        yield sentence, start, start + len(sentence), tokens
+        return
+
+    piece_start = piece_end = None
+    piece_tokens = 0
+    for m in WORD_RE.finditer(sentence):
+        # Summing per-word counts never undercounts the joined piece for either tokenizer
+        word_tokens = count_tokens(m.group(0))
+        if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+            yield sentence[piece_start:piece_end], start + piece_start, start + piece_end, piece_tokens
+            piece_start, piece_tokens = None, 0
+        if piece_start is None:
+            piece_start = m.start()
+        piece_end = m.end()
+        piece_tokens += word_tokens
+    if piece_start is not None:
+        yield sentence[piece_start:piece_end], start + piece_start, start + piece_end, piece_tokens
+
+
+def count_topics(text, topic_keywords):
+    lowered = text.lower()
+    return {topic: sum(lowered.count(kw.lower()) for kw in keywords) for topic, keywords in topic_keywords.items()}
+
+
+def make_chunk(sentences, pages, markers, count_tokens, topic_keywords):
+    text = " ".join(s for s, _, _ in sentences)
+    digest = text_hash(text)
+    images = [m.group(1) for m in (DIAGRAM_CROP_RE.match(marker) for marker in markers) if m]
+    return {
+        "id": "c_" + digest[:16],
+        "pages": pages,
+        "start": sentences[0][1],
+        "end": sentences[-1][2],
+        "tokens": count_tokens(text),
+        "hash": digest,
+        "topic_counts": count_topics(text, topic_keywords) if topic_keywords else {},
+        "markers": markers,
+        "images": images,
+        "text": text,
+    }
+
+
+def chunk_text(text, topic_keywords=None, max_tokens=DEFAULT_MAX_TOKENS, min_tokens=DEFAULT_MIN_TOKENS,
+               overlap_sentences=DEFAULT_OVERLAP_SENTENCES, tokenizer="auto"):
+    _, count_tokens = get_token_counter(tokenizer)
+    chunks = []
+    buffer, buffer_tokens, pages, markers = [], 0, [], []
+
+    def flush():
+        nonlocal buffer, buffer_tokens
+        chunks.append(make_chunk(buffer, list(pages), list(markers), count_tokens, topic_keywords))
+        buffer = buffer[len(buffer) - overlap_sentences:] if overlap_sentences else []
+        buffer_tokens = sum(count_tokens(s) for s, _, _ in buffer)
+
+    for page, page_markers, body, body_start in iter_sections(text):
+        if not buffer:
+            pages, markers = [], []
+        if page is not None:
+            pages.append(page)
+        markers.extend(page_markers)
+
+        for sentence, sentence_start, _ in iter_sentences(body, body_start):
+            for piece, start, end, tokens in split_long_sentence(sentence, sentence_start, count_tokens, max_tokens):
+                if buffer and buffer_tokens + tokens > max_tokens:
+                    flush()
+                    pages, markers = ([page] if page is not None else []), list(page_markers)
+                buffer.append((piece, start, end))
+                buffer_tokens += tokens
+
+        # Close the chunk at the page boundary unless the page was too small to stand alone
+        if buffer and buffer_tokens >= min_tokens:
+            flush()
+            buffer, buffer_tokens = [], 0
+
+    if buffer:
+        if chunks and buffer_tokens < min_tokens and chunks[-1]["tokens"] + buffer_tokens <= max_tokens:
+            # Trailing scrap: fold it into the previous chunk rather than emit a near-empty one
+            last = chunks.pop()
+            prev = [(last["text"], last["start"], last["end"])]
+            buffer = prev + buffer
+            pages = sorted(set(last["pages"]) | set(pages))
+            markers = last["markers"] + [m for m in markers if m not in last["markers"]]
+        chunks.append(make_chunk(buffer, pages, markers, count_tokens, topic_keywords))
+
+    return chunks
+
+
+def index_meta(text, max_tokens, min_tokens, overlap_sentences, tokenizer_name, topic_keywords):
+    return {
+        "version": CHUNK_INDEX_VERSION,
+        "source_hash": text_hash(text),
+        "max_tokens": max_tokens,
+        "min_tokens": min_tokens,
+        "overlap_sentences": overlap_sentences,
+        "tokenizer": tokenizer_name,
+        "keywords_hash": text_hash(json.dumps(topic_keywords or {}, sort_keys=True)),
+    }
+
+
+def save_chunk_index(chunks, meta, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"meta": {**meta, "count": len(chunks)}}) + "\n")
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def load_chunk_index(path):
+    # Returns (meta, chunks), or (None, None) if the file is missing or unreadable
+    if not os.path.exists(path):
+        return None, None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.loads(f.readline())["meta"]
+            chunks = [json.loads(line) for line in f if line.strip()]
+    except (ValueError, KeyError):
+        return None, None
+    return meta, chunks
+
+
+def load_or_build_chunks(text, index_path=None, topic_keywords=None, max_tokens=DEFAULT_MAX_TOKENS,
+                         min_tokens=DEFAULT_MIN_TOKENS, overlap_sentences=DEFAULT_OVERLAP_SENTENCES,
+                         tokenizer="auto"):
+    # Reuses the persisted index when the source text and chunking parameters are unchanged
+    tokenizer_name, _ = get_token_counter(tokenizer)
+    meta = index_meta(text, max_tokens, min_tokens, overlap_sentences, tokenizer_name, topic_keywords)
+
+    if index_path:
+        saved_meta, chunks = load_chunk_index(index_path)
+        if saved_meta is not None and all(saved_meta.get(k) == v for k, v in meta.items()):
+            with span("generation.chunk_index") as s:
+                s.mark_cache(True)
+                s.add_items(len(chunks))
+            return chunks
+
+    with span("generation.chunk_index") as s:
+        s.mark_cache(False)
+        chunks = chunk_text(text, topic_keywords, max_tokens, min_tokens, overlap_sentences, tokenizer)
+        s.add_bytes(len(text))
+        s.add_items(len(chunks))
+    if index_path:
+        save_chunk_index(chunks, meta, index_path)
+    return chunks
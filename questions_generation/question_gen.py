@@ -107,18 +107,20 @@
 #     print("✅ Question generation completed successfully!")
 
 import json
+import os
 import random
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from functools import lru_cache
 
-# Load Ollama LLM
-llm = OllamaLLM(model="gemma3:1b")
-output_parser = StrOutputParser()
+from instrumentation.spans import span
+from questions_generation.chunker import load_or_build_chunks
+from Store_and_embed.question_store import append_question, is_nested_file, iter_questions, question_id, write_questions
+
+# LangChain, the Ollama client and the prompt chains are built on first use (see get_llm /
+# get_question_chain / get_subtopic_chain), so importing this module stays cheap.
+LLM_MODEL = "gemma3:1b"
 
 # Prompt to generate questions
-question_prompt = PromptTemplate.from_template("""
+QUESTION_TEMPLATE = """
 You are a question generator for academic exams.
 
 Given this text:
@@ -132,20 +134,40 @@ Generate ONE question suitable for {marks}-mark category.
 - Cognitive level: {cognitive_level}
 
 Only return the question, no explanations.
-""")
-
-question_chain = question_prompt | llm | output_parser
+"""
 
 # Prompt to predict subtopic
-subtopic_prompt = PromptTemplate.from_template("""
+SUBTOPIC_TEMPLATE = """
 Given the subject: {topic}
 And the question: "{question}"
 
 What is the best subtopic this question belongs to?
 Respond with a short academic subtopic label like "Neural Networks", "Backpropagation", etc.
-""")
+"""
+
+
+@lru_cache(maxsize=None)
+def get_llm():
+    from langchain_ollama import OllamaLLM
+
+    return OllamaLLM(model=LLM_MODEL)
+
+
+def build_chain(template):
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    return PromptTemplate.from_template(template) | get_llm() | StrOutputParser()
+
 
-subtopic_chain = subtopic_prompt | llm | output_parser
+@lru_cache(maxsize=None)
+def get_question_chain():
+    return build_chain(QUESTION_TEMPLATE)
+
+
+@lru_cache(maxsize=None)
+def get_subtopic_chain():
+    return build_chain(SUBTOPIC_TEMPLATE)
 
 # Configs
 MARKS_META = {
@@ -155,8 +177,6 @@ MARKS_META = {
     5: {"question_type": "long", "difficulty_level": "hard", "time": "6-10 min", "cognitive_level": "evaluating"}
 }
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-
 def detect_topic(text, topic_keywords):
     for topic, keywords in topic_keywords.items():
         for kw in keywords:
@@ -164,8 +184,24 @@ def detect_topic(text, topic_keywords):
                 return topic
     return "General"
 
-def generate_questions(text, topic_keywords, questions_per_category=5):
-    chunks = splitter.split_text(text)
+
+def chunk_topic(chunk, topic_keywords):
+    # topic_counts is precomputed in the chunk index, in keyword.json order
+    counts = chunk.get("topic_counts")
+    if not counts:
+        return detect_topic(chunk["text"], topic_keywords)
+    return next((topic for topic, count in counts.items() if count), "General")
+
+
+def generate_questions(text, topic_keywords, questions_per_category=5, store_path=None, chunk_index_path=None):
+    # With store_path set, each question is appended to the JSONL store as soon as it is generated,
+    # so a long run that dies halfway keeps everything produced so far. With chunk_index_path set,
+    # the chunk index is reused across runs as long as the text and chunking settings are unchanged.
+    chunks = load_or_build_chunks(text, chunk_index_path, topic_keywords)
+    # Re-runs against the same store only append questions whose stable id is not there yet
+    stored_ids = {q["id"] for q in iter_questions(store_path)} if store_path and os.path.exists(store_path) else set()
+    # Repeated passages (headers, slides repeated across decks) share a chunk id; ask about each once
+    chunks = list({chunk["id"]: chunk for chunk in chunks}.values())
     seen_questions = set()
     used_chunks = set()
     marks_buckets = {1: [], 2: [], 3: [], 5: []}
@@ -173,26 +209,31 @@ def generate_questions(text, topic_keywords, questions_per_category=5):
     for marks, meta in MARKS_META.items():
         while len(marks_buckets[marks]) < questions_per_category and len(used_chunks) < len(chunks):
             chunk = random.choice(chunks)
-            if chunk in used_chunks:
+            if chunk["id"] in used_chunks:
                 continue
-            used_chunks.add(chunk)
+            used_chunks.add(chunk["id"])
 
             # Generate question with Ollama
-            question = question_chain.invoke({
-                "text": chunk,
-                "marks": marks,
-                "question_type": meta["question_type"],
-                "difficulty_level": meta["difficulty_level"],
-                "cognitive_level": meta["cognitive_level"]
-            }).strip()
+            with span("generation.llm.question", marks=marks) as s:
+                question = get_question_chain().invoke({
+                    "text": chunk["text"],
+                    "marks": marks,
+                    "question_type": meta["question_type"],
+                    "difficulty_level": meta["difficulty_level"],
+                    "cognitive_level": meta["cognitive_level"]
+                }).strip()
+                s.add_bytes(len(chunk["text"]))
+                s.set(tokens=chunk["tokens"])
 
             if not question or question in seen_questions:
                 continue
             seen_questions.add(question)
 
             # Detect topic + subtopic
-            topic = detect_topic(chunk, topic_keywords)
-            subtopic = subtopic_chain.invoke({"topic": topic, "question": question}).strip()
+            topic = chunk_topic(chunk, topic_keywords)
+            with span("generation.llm.subtopic", marks=marks) as s:
+                subtopic = get_subtopic_chain().invoke({"topic": topic, "question": question}).strip()
+                s.add_bytes(len(question))
 
             question_json = {
                 "question": question,
@@ -203,10 +244,15 @@ def generate_questions(text, topic_keywords, questions_per_category=5):
                 "time": meta["time"],
                 "cognitive_level": meta["cognitive_level"],
                 "marks": marks,
-                "image": None
+                "image": chunk["images"][0] if chunk["images"] else None,
+                "page": chunk["pages"][0] if chunk["pages"] else None,
+                "chunk_id": chunk["id"]
             }
 
             marks_buckets[marks].append(question_json)
+            if store_path and question_id(question_json) not in stored_ids:
+                stored_ids.add(question_id(question_json))
+                append_question(question_json, store_path)
 
     return {
         "1_mark": marks_buckets[1],
@@ -216,18 +262,27 @@ def generate_questions(text, topic_keywords, questions_per_category=5):
     }
 
 def save_questions(output, filename="new_output_questions.json"):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    if is_nested_file(filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    else:
+        write_questions((q for questions in output.values() for q in questions), filename)
     print(f"✅ Saved structured questions to {filename}")
 
 if __name__ == "__main__":
-    with open("/Users/sanatwalia/Desktop/Zomato_Showcasing/coe-project/questions_generation/extracted_output.txt", "r", encoding="utf-8") as f:
+    input_path = "/Users/sanatwalia/Desktop/Zomato_Showcasing/coe-project/questions_generation/extracted_output.txt"
+    with open(input_path, "r", encoding="utf-8") as f:
         text = f.read()
 
     with open("/Users/sanatwalia/Desktop/Zomato_Showcasing/coe-project/questions_generation/keyword.json", "r", encoding="utf-8") as kf:
         topic_keywords = json.load(kf)
 
     print("🚀 Generating questions with Ollama...")
-    final_questions = generate_questions(text, topic_keywords)
+    final_questions = generate_questions(
+        text,
+        topic_keywords,
+        chunk_index_path=os.path.splitext(input_path)[0] + ".chunks.jsonl",  # saved next to the input text
+        store_path="questions.jsonl",  # appended as questions are generated; ids already stored are skipped
+    )
     save_questions(final_questions)
     print("✅ Question generation completed successfully!")
@@ -0,0 +1,45 @@
+from questions_generation.chunker import chunk_text, load_or_build_chunks, get_token_counter
+
+_, count_tokens = get_token_counter("approx")
+
+
+def page(n, body, markers="[No diagrams/images found]\n[No special patterns found]"):
+    return f"\n\n--- Page {n} ---\n{markers}\n{body}"
+
+
+def test_unpunctuated_page_is_split_at_word_boundaries():
+    words = [f"word{i}" for i in range(2000)]
+    text = page(1, " ".join(words)).strip()
+
+    chunks = chunk_text(text, max_tokens=160, tokenizer="approx")
+
+    assert len(chunks) > 1
+    assert all(c["tokens"] <= 160 for c in chunks)
+    assert " ".join(c["text"] for c in chunks).split() == words
+    for c in chunks:
+        assert text[c["start"]:c["end"]] == c["text"]
+        assert c["tokens"] == count_tokens(c["text"])
+
+
+def test_chunks_follow_pages_and_keep_markers_out_of_text():
+    crop = "[DIAGRAM CROP] /tmp/doc_diagrams/page2_diagram1.png (x=1, y=2, w=3, h=4)"
+    body = "Neural networks learn weights from data by gradient descent over many examples. " * 4
+    text = (page(1, body) + page(2, body, markers=f"[DIAGRAM or IMAGE DETECTED] (1 images on this page)\n{crop}")).strip()
+
+    chunks = chunk_text(text, topic_keywords={"AI": ["neural networks"]}, tokenizer="approx")
+
+    assert [c["pages"] for c in chunks] == [[1], [2]]
+    assert chunks[1]["images"] == ["/tmp/doc_diagrams/page2_diagram1.png"]
+    assert all("[" not in c["text"] for c in chunks)
+    assert chunks[0]["topic_counts"] == {"AI": 4}
+
+
+def test_chunk_index_is_reused_until_text_changes(tmp_path):
+    index_path = str(tmp_path / "chunks.jsonl")
+    text = page(1, "Backpropagation computes gradients layer by layer. " * 10).strip()
+
+    first = load_or_build_chunks(text, index_path, tokenizer="approx")
+    assert load_or_build_chunks(text, index_path, tokenizer="approx") == first
+
+    changed = load_or_build_chunks(text + " Dropout regularizes training.", index_path, tokenizer="approx")
+    assert changed != first
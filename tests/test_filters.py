@@ -0,0 +1,36 @@
+from Store_and_embed.filters import difficulty_of, smart_filter
+
+
+class Doc:
+    def __init__(self, name, **metadata):
+        self.name = name
+        self.metadata = metadata
+
+
+DOCS = [
+    Doc("a", marks=3, difficulty="medium", cognitive_level="applying"),
+    Doc("b", marks=3, difficulty="hard", cognitive_level="applying"),
+    Doc("c", marks=5, difficulty_level="Medium", cognitive_level="evaluating"),
+    Doc("d", marks=1, difficulty="easy", cognitive_level="remembering"),
+]
+
+
+def names(docs):
+    return [d.name for d in docs]
+
+
+def test_exact_match_wins():
+    assert names(smart_filter(DOCS, 3, "Medium", "APPLYING")) == ["a"]
+
+
+def test_falls_back_to_same_difficulty_regardless_of_marks():
+    assert names(smart_filter(DOCS, 2, "medium", "applying")) == ["a", "c"]
+
+
+def test_falls_back_to_top_three():
+    assert names(smart_filter(DOCS, 2, "expert", "creating")) == ["a", "b", "c"]
+
+
+def test_difficulty_reads_legacy_key():
+    assert difficulty_of({"difficulty_level": "Hard"}) == "hard"
+    assert difficulty_of({}) == ""
@@ -0,0 +1,27 @@
+import pytest
+
+from Store_and_embed.search_service import MAX_K, parse_search_body
+
+FILTERS = {"difficulty": "medium", "cognitive": "applying"}
+
+
+def test_valid_request_with_filters():
+    assert parse_search_body({"query": "q", "k": "5", "marks": "3", **FILTERS}) == ("q", 5, (3, "medium", "applying"))
+
+
+def test_k_is_clamped():
+    assert parse_search_body({"query": "q", "k": 10 ** 9})[1] == MAX_K
+    assert parse_search_body({"query": "q", "k": -4})[1] == 1
+
+
+@pytest.mark.parametrize("value", [3.7, True, "three", [3]])
+def test_non_integer_marks_and_k_are_rejected(value):
+    with pytest.raises(ValueError, match="'marks' must be an integer"):
+        parse_search_body({"query": "q", "marks": value, **FILTERS})
+    with pytest.raises(ValueError, match="'k' must be an integer"):
+        parse_search_body({"query": "q", "k": value})
+
+
+def test_partial_filters_are_rejected():
+    with pytest.raises(ValueError, match="must be given together"):
+        parse_search_body({"query": "q", "marks": 3})
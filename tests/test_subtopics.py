@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from Clean_subtopics.subtopics import SubtopicNormalizer, split_acronym
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_only_initialisms_are_acronyms():
+    assert split_acronym("Natural Language Processing (NLP)") == ("Natural Language Processing", "NLP")
+    assert split_acronym("Long Short-Term Memory (LSTM)") == ("Long Short-Term Memory", "LSTM")
+    assert split_acronym("Large Language Models (LLMs)") == ("Large Language Models", "LLM")
+    assert split_acronym("Theory of Computation (TOC)") == ("Theory of Computation", "TOC")
+    assert split_acronym("Regression (Linear)") is None
+    assert split_acronym("Transformers (BERT)") is None
+    assert split_acronym("Optimization (ADAM)") is None
+    assert split_acronym("(NLP)") is None
+
+
+def test_qualified_labels_are_kept_and_do_not_alias():
+    raws = ["Regression (Linear)", "Linear", "Transformers (BERT)", "BERT", "Optimization (Adam)", "Adam"]
+    assert SubtopicNormalizer().normalize_batch(raws) == raws
+
+
+def test_acronym_alias_does_not_depend_on_input_order():
+    raws = ["TM", "Transformer Models (TM)", "TM"]
+    assert SubtopicNormalizer().normalize_batch(raws) == ["Transformer Models"] * 3
+    assert SubtopicNormalizer().normalize_batch(raws[::-1]) == ["Transformer Models"] * 3
+
+
+def test_conflicting_full_forms_leave_acronym_unaliased():
+    raws = ["Convolutional Neural Networks (CNN)", "Cable News Network (CNN)", "CNN"]
+    assert SubtopicNormalizer().normalize_batch(raws) == ["Convolutional Neural Networks", "Cable News Network", "CNN"]
+
+
+def test_labels_do_not_depend_on_hash_seed():
+    script = (
+        "from Clean_subtopics.subtopics import SubtopicNormalizer\n"
+        "print(SubtopicNormalizer().normalize_batch(["
+        "'Neural Networks (CNN)', 'Convolutional Neural Networks (CNN)', 'CNN', "
+        "'Cable News Network (CN)', 'Computer Networks (CN)', 'CN']))\n"
+    )
+    outputs = {
+        subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+        ).stdout
+        for seed in range(6)
+    }
+    assert len(outputs) == 1